@@ -0,0 +1,186 @@
+"""
+Синтетические данные для нагрузочных тестов.
+
+Генератор детерминирован: при одном seed получаются одни и те же
+пользователи, посты, комментарии и подписки. Строки пишутся пачками
+через bulk_create, сигналы при этом не срабатывают, поэтому счетчики,
+ленты подписок и индекс поиска заполняются в конце отдельно.
+
+Граф подписок степенной: число подписок пользователя распределено
+по Парето, а авторы выбираются по закону Ципфа, так что у немногих
+авторов много подписчиков, как в живой сети.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from posts import counters, search
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+PASSWORD = 'benchmark'
+WORDS = (
+    'кот', 'пес', 'город', 'море', 'утро', 'книга', 'песня', 'дорога',
+    'осень', 'чай', 'сон', 'поезд', 'лес', 'река', 'друг', 'окно',
+)
+
+
+@contextmanager
+def explicit_dates():
+    """Дает bulk_create записать даты, иначе auto_now_add их затрет."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def text(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, words)))
+
+
+def _create(model, objects, batch_size):
+    for start in range(0, len(objects), batch_size):
+        model.objects.bulk_create(
+            objects[start:start + batch_size], ignore_conflicts=True
+        )
+
+
+def follow_graph(rng, user_ids, alpha=1.5, exponent=1.1):
+    """Пары (читатель, автор) со степенным распределением подписчиков."""
+    authors = user_ids[:]
+    rng.shuffle(authors)
+    weights = list(accumulate(
+        1 / (rank + 1) ** exponent for rank in range(len(authors))
+    ))
+    pairs = set()
+    for user_id in user_ids:
+        wanted = min(int(rng.paretovariate(alpha)), len(authors) - 1)
+        chosen = set()
+        for _ in range(wanted * 3):
+            if len(chosen) >= wanted:
+                break
+            author_id = rng.choices(authors, cum_weights=weights)[0]
+            if author_id != user_id:
+                chosen.add(author_id)
+        pairs.update((user_id, author_id) for author_id in chosen)
+    return sorted(pairs)
+
+
+def fill_timelines(follows, batch_size):
+    """Ленты подписок одной пачкой вставок вместо timeline.rebuild."""
+    limit = settings.TIMELINE_BACKFILL_LIMIT
+    followers = {}
+    for _, author_id in follows:
+        followers[author_id] = followers.get(author_id, 0) + 1
+    latest = {}
+    for post_id, author_id, pub_date in Post.objects.order_by(
+        'author_id', '-pub_date', '-id'
+    ).values_list('id', 'author_id', 'pub_date').iterator():
+        posts = latest.setdefault(author_id, [])
+        if len(posts) < limit:
+            posts.append((post_id, pub_date))
+    entries = [
+        TimelineEntry(
+            user_id=user_id, post_id=post_id,
+            author_id=author_id, pub_date=pub_date,
+        )
+        for user_id, author_id in follows
+        if followers[author_id] <= settings.TIMELINE_FAN_OUT_LIMIT
+        for post_id, pub_date in latest.get(author_id, ())
+    ]
+    _create(TimelineEntry, entries, batch_size)
+    return len(entries)
+
+
+def generate(users=100, posts=1000, comments=3000, groups=10, seed=1,
+             batch_size=1000):
+    """
+    Заполняет пустую базу и возвращает число созданных строк по таблицам.
+    Посты и комментарии распределены по последним 365 дням.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    year = timedelta(days=365).total_seconds()
+    password = make_password(PASSWORD, salt='benchmark')
+    with transaction.atomic(), explicit_dates():
+        _create(User, [
+            User(username=f'user{number}', password=password)
+            for number in range(users)
+        ], batch_size)
+        user_ids = list(User.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        _create(Group, [
+            Group(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description=text(rng),
+            )
+            for number in range(groups)
+        ], batch_size)
+        group_ids = list(Group.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        dates = sorted(
+            now - timedelta(seconds=rng.random() * year)
+            for _ in range(posts)
+        )
+        _create(Post, [
+            Post(
+                text=text(rng, 40),
+                author_id=rng.choice(user_ids),
+                group_id=(
+                    rng.choice(group_ids)
+                    if group_ids and rng.random() < 0.7 else None
+                ),
+                pub_date=pub_date,
+            )
+            for pub_date in dates
+        ], batch_size)
+        post_dates = list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date'
+        ))
+        if post_dates:
+            # Обсуждают в основном свежие посты.
+            _create(Comment, [
+                Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(user_ids),
+                    text=text(rng),
+                    created=pub_date + (now - pub_date) * rng.random(),
+                )
+                for post_id, pub_date in (
+                    post_dates[int(len(post_dates) * rng.random() ** 0.3)]
+                    for _ in range(comments)
+                )
+            ], batch_size)
+        follows = follow_graph(rng, user_ids)
+        _create(Follow, [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in follows
+        ], batch_size)
+        timeline = fill_timelines(follows, batch_size)
+        counters.recount()
+    search.rebuild(batch_size)
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_dates),
+        'comments': Comment.objects.count(),
+        'follows': len(follows),
+        'timeline': timeline,
+    }
@@ -0,0 +1,115 @@
+import json
+import platform
+import subprocess
+import sys
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from benchmarks import dataset
+from benchmarks.runner import run
+from benchmarks.scenarios import SCENARIOS, Fixtures
+from core.testing import isolated_caches, isolated_files
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу синтетическими данными и замеряет '
+        'маршруты posts/urls.py. Отчет — JSON, его можно сравнивать '
+        'между коммитами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--allocation-requests', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кеш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS),
+            help='Какие сценарии гонять (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--output', help='Файл для отчета (по умолчанию stdout).',
+        )
+
+    @isolated_caches()
+    @isolated_files()
+    def handle(self, *args, **options):
+        if options['users'] < 3 or options['posts'] < 1:
+            raise CommandError('Нужно хотя бы 3 пользователя и 1 пост.')
+        scenarios = {
+            name: SCENARIOS[name]
+            for name in options['scenario'] or SCENARIOS
+        }
+        setup_test_environment(debug=False)
+        # Данные пишутся во временную базу, как в тестах, а кеш, логи
+        # и метрики — во временный каталог; рабочие файлы не меняются.
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            cache.clear()
+            rows = dataset.generate(
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+                groups=options['groups'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+            )
+            report = {
+                'meta': {
+                    'commit': git_commit(),
+                    'created': timezone.now().isoformat(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'cache': settings.CACHES['default']['BACKEND'],
+                    'cold': options['cold'],
+                    'seed': options['seed'],
+                    'dataset': rows,
+                },
+                'scenarios': run(
+                    scenarios,
+                    Fixtures.load(options['seed']),
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                    allocation_requests=options['allocation_requests'],
+                    cold=options['cold'],
+                ),
+            }
+        finally:
+            cache.clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,109 @@
+"""
+Прогон сценариев через тестовый клиент Django: весь стек middleware,
+шаблоны и кеш, но без сети. Для каждого сценария считаются перцентили
+времени ответа, число запросов к базе и память, выделенная за запрос.
+"""
+import gc
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[int(rank)]
+
+
+def _request(client, scenario, fixtures):
+    method, url, data = scenario(fixtures)
+    response = getattr(client, method)(url, data)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url}: ответ {response.status_code}')
+    if response.streaming:
+        # Потоковый ответ читает базу по мере отдачи тела.
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, scenario, fixtures, requests, warmup, cold):
+    for _ in range(warmup):
+        _request(client, scenario, fixtures)
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            _request(client, scenario, fixtures)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+    return latencies, queries
+
+
+def allocations(client, scenario, fixtures, requests, cold):
+    """Пиковая и оставшаяся после запроса память по tracemalloc."""
+    peaks = []
+    retained = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            _request(client, scenario, fixtures)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return peaks, retained
+
+
+def run(scenarios, fixtures, requests=50, warmup=5, allocation_requests=5,
+        cold=False):
+    """
+    Прогоняет сценарии {имя: функция} от имени fixtures.reader
+    и возвращает отчет {имя: метрики}. С cold=True кеш сбрасывается
+    перед каждым запросом, иначе — перед каждым сценарием, поэтому
+    run вызывается во временном кеше (isolated_caches), как
+    в manage.py benchmark.
+    """
+    report = {}
+    for name, scenario in scenarios.items():
+        client = Client()
+        client.force_login(fixtures.reader)
+        cache.clear()
+        latencies, queries = measure(
+            client, scenario, fixtures, requests, warmup, cold
+        )
+        peaks, retained = allocations(
+            client, scenario, fixtures, allocation_requests, cold
+        )
+        report[name] = {
+            'requests': requests,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+            },
+            'queries': {
+                'min': min(queries),
+                'max': max(queries),
+                'mean': round(sum(queries) / len(queries), 2),
+            },
+            'allocations_bytes': {
+                'peak_p50': percentile(peaks, 50),
+                'retained_p50': percentile(retained, 50),
+            },
+        }
+    return report
@@ -0,0 +1,284 @@
+"""
+Сценарии нагрузки: по одному на каждый маршрут posts/urls.py.
+
+Сценарий получает Fixtures — объекты из сгенерированных данных —
+и возвращает запрос (метод, адрес, данные). Параметры выбираются
+детерминированно, по seed, как и сами данные. Фрагменты лент
+запрашиваются со второй страницы: курсоры первых страниц считаются
+в Fixtures.load, а не внутри замера.
+"""
+import random
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+from posts.timeline import TimelinePaginator
+from posts.utils import CursorPaginator, comment_page
+
+from .dataset import WORDS
+
+User = get_user_model()
+
+
+def _next_cursor(posts):
+    return CursorPaginator(
+        posts, settings.POSTS_PER_PAGE
+    ).get_page(None).next_cursor
+
+
+def _latest(posts):
+    return posts.aggregate(latest=Max('pk'))['latest'] or 0
+
+
+@dataclass
+class Fixtures:
+    """Объекты, на которых гоняются сценарии."""
+    reader: User
+    author: User
+    other: User
+    group: Group
+    post: Post
+    own_post: Post
+    # Курсоры вторых страниц лент по именам сценариев.
+    cursors: dict = field(default_factory=dict)
+    # Последний пост лент для опроса новых постов по именам сценариев.
+    latest: dict = field(default_factory=dict)
+    rng: random.Random = field(default_factory=random.Random)
+
+    @classmethod
+    def load(cls, seed):
+        """Самый активный читатель, самый популярный автор и т. д."""
+        reader = User.objects.annotate(
+            following_total=Count('follower')
+        ).order_by('-following_total', 'pk').first()
+        author = User.objects.annotate(
+            followers_total=Count('following')
+        ).order_by('-followers_total', 'pk').first()
+        other = User.objects.exclude(pk__in=[reader.pk, author.pk]).exclude(
+            pk__in=Follow.objects.filter(user=reader).values('author')
+        ).order_by('pk').first() or author
+        group = Group.objects.order_by('-posts_count', 'pk').first()
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        return cls(
+            reader=reader,
+            author=author,
+            other=other,
+            group=group,
+            post=post,
+            own_post=(
+                Post.objects.filter(author=reader).first()
+                or Post.objects.first()
+            ),
+            cursors={
+                'post_comments': comment_page(post).next_cursor,
+                'index_fragment': _next_cursor(Post.objects.all()),
+                'group_list_fragment': _next_cursor(
+                    Post.objects.filter(group=group)
+                ),
+                'profile_fragment': _next_cursor(
+                    Post.objects.filter(author=author)
+                ),
+                'follow_index_fragment': TimelinePaginator(
+                    reader, settings.POSTS_PER_PAGE
+                ).get_page(None).next_cursor,
+            },
+            latest={
+                'api_new_posts': _latest(Post.objects.all()),
+                'api_group_new_posts': _latest(
+                    Post.objects.filter(group=group)
+                ),
+                'api_author_new_posts': _latest(
+                    Post.objects.filter(author=author)
+                ),
+                'api_follow_new_posts': _latest(
+                    Post.objects.filter(author__following__user=reader)
+                ),
+            },
+            rng=random.Random(seed),
+        )
+
+    def cursor(self, name):
+        """Параметры второй страницы ленты или None, если она одна."""
+        cursor = self.cursors.get(name)
+        return {'cursor': cursor} if cursor else None
+
+    def since(self, name):
+        """Опрос клиента, у которого уже есть последний пост ленты."""
+        return {'since': self.latest[name]}
+
+
+def index(fixtures):
+    return 'get', reverse('posts:index'), None
+
+
+def group_list(fixtures):
+    return 'get', reverse(
+        'posts:group_list', args=[fixtures.group.slug]
+    ), None
+
+
+def index_fragment(fixtures):
+    return 'get', reverse('posts:index_fragment'), fixtures.cursor(
+        'index_fragment'
+    )
+
+
+def group_list_fragment(fixtures):
+    return 'get', reverse(
+        'posts:group_list_fragment', args=[fixtures.group.slug]
+    ), fixtures.cursor('group_list_fragment')
+
+
+def profile(fixtures):
+    return 'get', reverse(
+        'posts:profile', args=[fixtures.author.username]
+    ), None
+
+
+def profile_fragment(fixtures):
+    return 'get', reverse(
+        'posts:profile_fragment', args=[fixtures.author.username]
+    ), fixtures.cursor('profile_fragment')
+
+
+def post_detail(fixtures):
+    return 'get', reverse('posts:post_detail', args=[fixtures.post.pk]), None
+
+
+def post_comments(fixtures):
+    return 'get', reverse(
+        'posts:post_comments', args=[fixtures.post.pk]
+    ), fixtures.cursor('post_comments')
+
+
+def post_create(fixtures):
+    return 'get', reverse('posts:post_create'), None
+
+
+def post_edit(fixtures):
+    return 'get', reverse(
+        'posts:post_edit', args=[fixtures.own_post.pk]
+    ), None
+
+
+def add_comment(fixtures):
+    return 'post', reverse('posts:add_comment', args=[fixtures.post.pk]), {
+        'text': fixtures.rng.choice(WORDS),
+    }
+
+
+def follow_index(fixtures):
+    return 'get', reverse('posts:follow_index'), None
+
+
+def follow_index_fragment(fixtures):
+    return 'get', reverse('posts:follow_index_fragment'), fixtures.cursor(
+        'follow_index_fragment'
+    )
+
+
+def profile_follow(fixtures):
+    return 'get', reverse(
+        'posts:profile_follow', args=[fixtures.other.username]
+    ), None
+
+
+def profile_unfollow(fixtures):
+    return 'get', reverse(
+        'posts:profile_unfollow', args=[fixtures.other.username]
+    ), None
+
+
+def groups(fixtures):
+    return 'get', reverse('posts:groups'), None
+
+
+def search(fixtures):
+    return 'get', reverse('posts:search'), {
+        'q': fixtures.rng.choice(WORDS),
+    }
+
+
+def api_posts(fixtures):
+    return 'get', reverse('posts:api_posts'), None
+
+
+def api_group_posts(fixtures):
+    return 'get', reverse(
+        'posts:api_group_posts', args=[fixtures.group.slug]
+    ), None
+
+
+def api_author_posts(fixtures):
+    return 'get', reverse(
+        'posts:api_author_posts', args=[fixtures.author.username]
+    ), None
+
+
+def api_post_comments(fixtures):
+    return 'get', reverse(
+        'posts:api_post_comments', args=[fixtures.post.pk]
+    ), None
+
+
+def api_follow_posts(fixtures):
+    return 'get', reverse('posts:api_follow_posts'), None
+
+
+def api_new_posts(fixtures):
+    return 'get', reverse('posts:api_new_posts'), fixtures.since(
+        'api_new_posts'
+    )
+
+
+def api_group_new_posts(fixtures):
+    return 'get', reverse(
+        'posts:api_group_new_posts', args=[fixtures.group.slug]
+    ), fixtures.since('api_group_new_posts')
+
+
+def api_author_new_posts(fixtures):
+    return 'get', reverse(
+        'posts:api_author_new_posts', args=[fixtures.author.username]
+    ), fixtures.since('api_author_new_posts')
+
+
+def api_follow_new_posts(fixtures):
+    return 'get', reverse('posts:api_follow_new_posts'), fixtures.since(
+        'api_follow_new_posts'
+    )
+
+
+# Имя маршрута posts:<имя> — сценарий.
+SCENARIOS = {
+    'index': index,
+    'index_fragment': index_fragment,
+    'group_list': group_list,
+    'group_list_fragment': group_list_fragment,
+    'profile': profile,
+    'profile_fragment': profile_fragment,
+    'post_detail': post_detail,
+    'post_comments': post_comments,
+    'post_create': post_create,
+    'post_edit': post_edit,
+    'add_comment': add_comment,
+    'follow_index': follow_index,
+    'follow_index_fragment': follow_index_fragment,
+    'profile_follow': profile_follow,
+    'profile_unfollow': profile_unfollow,
+    'groups': groups,
+    'search': search,
+    'api_posts': api_posts,
+    'api_group_posts': api_group_posts,
+    'api_author_posts': api_author_posts,
+    'api_post_comments': api_post_comments,
+    'api_follow_posts': api_follow_posts,
+    'api_new_posts': api_new_posts,
+    'api_group_new_posts': api_group_new_posts,
+    'api_author_new_posts': api_author_new_posts,
+    'api_follow_new_posts': api_follow_new_posts,
+}
@@ -0,0 +1,97 @@
+import io
+import random
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from posts.models import Follow, Post, TimelineEntry, UserStats
+
+from . import dataset
+from .management.commands import benchmark
+from .runner import percentile, run
+from .scenarios import SCENARIOS, Fixtures
+
+
+class DatasetTests(TestCase):
+    def test_generate(self):
+        rows = dataset.generate(
+            users=20, posts=50, comments=80, groups=3, seed=7, batch_size=16
+        )
+        self.assertEqual(rows['posts'], Post.objects.count())
+        self.assertEqual(rows['follows'], Follow.objects.count())
+        self.assertEqual(rows['timeline'], TimelineEntry.objects.count())
+        self.assertEqual(UserStats.objects.count(), 20)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 50
+        )
+        self.assertGreater(
+            Post.objects.order_by('pub_date').last().pub_date,
+            Post.objects.order_by('pub_date').first().pub_date,
+        )
+
+    def test_same_seed_same_follow_graph(self):
+        users = list(range(1, 101))
+        first = dataset.follow_graph(random.Random(3), users)
+        self.assertEqual(first, dataset.follow_graph(random.Random(3), users))
+        self.assertNotEqual(
+            first, dataset.follow_graph(random.Random(4), users)
+        )
+
+
+class RunnerTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+
+    def test_every_scenario_runs(self):
+        dataset.generate(users=10, posts=30, comments=30, groups=2)
+        cache.clear()
+        report = run(
+            SCENARIOS, Fixtures.load(1),
+            requests=2, warmup=0, allocation_requests=1,
+        )
+        self.assertEqual(set(report), set(SCENARIOS))
+        for metrics in report.values():
+            self.assertGreater(metrics['latency_ms']['p50'], 0)
+            self.assertGreater(metrics['queries']['max'], 0)
+
+    def test_command_keeps_site_files(self):
+        """
+        manage.py benchmark идет во временных кеше, логах и метриках
+        и не сбрасывает кеш сайта. Временная база здесь — тестовая.
+        """
+        cache.set('site-key', 'значение')
+        paths = {}
+
+        def recording_run(*args, **kwargs):
+            paths.update(
+                cache=settings.CACHES['shared']['LOCATION'],
+                metrics=settings.METRICS_DIR,
+                slow_queries=settings.SLOW_QUERY_LOG,
+            )
+            return run(*args, **kwargs)
+
+        creation = connection.creation
+        with mock.patch.object(benchmark, 'run', recording_run), \
+                mock.patch.object(benchmark, 'setup_test_environment'), \
+                mock.patch.object(benchmark, 'teardown_test_environment'), \
+                mock.patch.object(creation, 'create_test_db'), \
+                mock.patch.object(creation, 'destroy_test_db'):
+            call_command(
+                'benchmark', users=5, posts=5, comments=5, groups=1,
+                requests=1, warmup=0, allocation_requests=1,
+                scenario=['index'], stdout=io.StringIO(),
+            )
+        self.assertEqual(cache.get('site-key'), 'значение')
+        self.assertEqual(set(paths), {'cache', 'metrics', 'slow_queries'})
+        self.assertNotEqual(
+            paths['cache'], settings.CACHES['shared']['LOCATION']
+        )
+        self.assertNotEqual(paths['metrics'], settings.METRICS_DIR)
+        self.assertNotEqual(paths['slow_queries'], settings.SLOW_QUERY_LOG)
@@ -1,5 +1,31 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def _install(connection, marker, wrapper):
+    if not any(
+        getattr(installed, marker, False)
+        for installed in connection.execute_wrappers
+    ):
+        setattr(wrapper, marker, True)
+        # В начало списка: execute_wrapper() снимает последнюю обертку,
+        # а соединение может открыться внутри такого блока.
+        connection.execute_wrappers.insert(0, wrapper)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Вешает на соединение (один раз) замер запросов для /metrics/
+    и журнал медленных запросов.
+    """
+    from .metrics import database_wrapper
+    from .slow_queries import slow_query_wrapper
+    _install(connection, 'metrics', database_wrapper(connection.alias))
+    _install(connection, 'slow_queries', slow_query_wrapper)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        connection_created.connect(instrument_connection)
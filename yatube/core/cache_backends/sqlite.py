@@ -0,0 +1,287 @@
+"""
+Общий для всех процессов кеш в файле SQLite (режим WAL).
+
+Работает на одной машине без Redis и memcached: все WSGI-процессы
+видят одни и те же записи, поэтому сброс кеша в одном процессе
+сразу виден остальным, а память не дублируется. Объем ограничен
+OPTIONS['MAX_SIZE'] байт, при переполнении вытесняются записи,
+к которым дольше всего не обращались (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_size (total INTEGER NOT NULL)',
+    '''
+    INSERT INTO cache_size (total)
+    SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM cache_size)
+    ''',
+    'CREATE TABLE IF NOT EXISTS cache_evictions (total INTEGER NOT NULL)',
+    '''
+    INSERT INTO cache_evictions (total)
+    SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM cache_evictions)
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+        UPDATE cache_size SET total = total + NEW.size;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+        UPDATE cache_size SET total = total - OLD.size;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+    BEGIN
+        UPDATE cache_size SET total = total - OLD.size + NEW.size;
+    END
+    ''',
+)
+
+UPSERT = '''
+    INSERT INTO cache (key, value, expires, accessed, size)
+    VALUES (:key, :value, :expires, :now, :size)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value,
+        expires = excluded.expires,
+        accessed = excluded.accessed,
+        size = excluded.size
+'''
+NOT_EXPIRED = '(expires IS NULL OR expires > :now)'
+
+
+@contextmanager
+def immediate(connection):
+    """Транзакция, сразу берущая блокировку на запись."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    """
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+            'LOCATION': '/path/to/cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        # Время последнего чтения обновляется не чаще раза в интервал,
+        # чтобы чтения не превращались в запись.
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1.0))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5.0))
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with immediate(connection):
+            for statement in SCHEMA:
+                connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return {
+            'key': key,
+            'value': blob,
+            'expires': self.get_backend_timeout(timeout),
+            'now': now,
+            'size': len(key) + len(blob),
+        }
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        connection = self._connection()
+        now = time.time()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache '
+            'WHERE key IN (%s) AND (expires IS NULL OR expires > ?)' % (
+                ', '.join('?' * len(keys))
+            ),
+            [*keys, now],
+        ).fetchall()
+        touched = [
+            (now, key) for key, _, accessed in rows
+            if now - accessed > self._touch_interval
+        ]
+        if touched:
+            with immediate(connection):
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?', touched
+                )
+        return {keys[key]: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection()
+        with immediate(connection):
+            connection.executemany(UPSERT, rows)
+        self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._row(self._key(key, version), value, timeout, time.time())
+        connection = self._connection()
+        with immediate(connection):
+            added = connection.execute(
+                UPSERT + ' WHERE cache.expires IS NOT NULL '
+                'AND cache.expires <= :now',
+                row,
+            ).rowcount
+        if added:
+            self._cull(connection)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        with immediate(connection):
+            touched = connection.execute(
+                'UPDATE cache SET expires = :expires WHERE key = :key AND '
+                + NOT_EXPIRED,
+                {
+                    'key': self._key(key, version),
+                    'expires': self.get_backend_timeout(timeout),
+                    'now': time.time(),
+                },
+            ).rowcount
+        return bool(touched)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with immediate(connection):
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = :key AND ' + NOT_EXPIRED,
+                {'key': key, 'now': time.time()},
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (blob, len(key) + len(blob), key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = :key AND ' + NOT_EXPIRED,
+            {'key': self._key(key, version), 'now': time.time()},
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        connection = self._connection()
+        with immediate(connection):
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def clear(self):
+        connection = self._connection()
+        with immediate(connection):
+            connection.execute('DELETE FROM cache')
+
+    def size(self):
+        """Суммарный объем записей в байтах."""
+        return self._connection().execute(
+            'SELECT total FROM cache_size'
+        ).fetchone()[0]
+
+    @property
+    def evictions(self):
+        """Сколько записей вытеснено по LRU за все время файла."""
+        return self._connection().execute(
+            'SELECT total FROM cache_evictions'
+        ).fetchone()[0]
+
+    def _cull(self, connection):
+        if self.size() <= self._max_size:
+            return
+        target = self._max_size * (1 - 1 / self._cull_frequency)
+        with immediate(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE expires IS NOT NULL '
+                'AND expires <= ?', (time.time(),),
+            )
+            # Удаляются самые давно читанные записи, пока их суммарный
+            # объем не покроет превышение.
+            evicted = connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM ('
+                'SELECT key, size, SUM(size) OVER ('
+                'ORDER BY accessed ROWS UNBOUNDED PRECEDING) AS freed '
+                'FROM cache) WHERE freed - size < ?)',
+                (self.size() - target,),
+            ).rowcount
+            connection.execute(
+                'UPDATE cache_evictions SET total = total + ?', (evicted,)
+            )
+
+    def close(self, **kwargs):
+        # Соединение живет весь срок потока: сигнал request_finished
+        # не должен закрывать его после каждого запроса.
+        pass
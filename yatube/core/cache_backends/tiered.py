@@ -0,0 +1,323 @@
+"""
+Двухуровневый кеш: L1 в памяти процесса перед общим кешем L2.
+
+L1 — LRU, ограниченный объемом в байтах, с коротким TTL: частые
+чтения (версии тегов, готовые страницы) не ходят в L2 и не
+распаковываются. Записи, удаления и сброс в любом процессе
+попадают в журнал инвалидации в L2; остальные процессы читают его
+не реже раза в SYNC_INTERVAL секунд и выбрасывают из L1 изменившиеся
+ключи. Крупные значения хранятся в L2 сжатыми zlib.
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics, profiling
+
+EPOCH_KEY = '_l1:epoch'
+LOG_KEY = '_l1:log:%d'
+LOG_SIZE = 256
+CLEAR = None
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class Compressed:
+    """Сжатое значение в L2."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __getstate__(self):
+        return self.data
+
+    def __setstate__(self, state):
+        self.data = state
+
+
+class LRUStore:
+    """L1 одного процесса: общий для всех потоков, как LocMemCache."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            'l1': {'hits': 0, 'misses': 0, 'evictions': 0},
+            'l2': {'hits': 0, 'misses': 0, 'compressed': 0},
+        }
+        # Последняя прочитанная эпоха журнала и эпохи своих записей.
+        self.seen = None
+        self.synced = 0.0
+        self.own = set()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.stats['l1']['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                self._pop(key)
+            self.stats['l1']['misses'] += 1
+            return None
+
+    def set(self, key, blob, expires):
+        with self.lock:
+            self._pop(key)
+            if len(blob) > self.max_size:
+                return
+            self.entries[key] = (blob, expires)
+            self.size += len(blob)
+            while self.size > self.max_size:
+                self._pop(next(iter(self.entries)))
+                self.stats['l1']['evictions'] += 1
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def count(self, tier, counter, amount=1):
+        with self.lock:
+            self.stats[tier][counter] += amount
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class TieredCache(BaseCache):
+    """
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.tiered.TieredCache',
+            'OPTIONS': {'L2': 'shared', 'L1_MAX_SIZE': 16 * 1024 * 1024},
+        },
+        'shared': {...},
+    }
+
+    Префикс, версия и таймаут по умолчанию берутся из настроек L2.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2', 'shared')
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._sync_interval = float(options.get('SYNC_INTERVAL', 0.5))
+        self._compress_min_size = int(options.get('COMPRESS_MIN_SIZE', 1024))
+        self._compress_level = int(options.get('COMPRESS_LEVEL', 6))
+        with _stores_lock:
+            self._store = _stores.setdefault(
+                (name, self._l2_alias),
+                LRUStore(int(options.get('L1_MAX_SIZE', 16 * 1024 * 1024))),
+            )
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def _key(self, key, version):
+        return self._l2.make_key(key, version=version)
+
+    def _l1_expires(self, timeout):
+        expires = time.time() + self._l1_timeout
+        backend_timeout = self._l2.get_backend_timeout(timeout)
+        if backend_timeout is None:
+            return expires
+        return min(expires, backend_timeout)
+
+    def _pack(self, value):
+        """Возвращает (значение для L2, pickle для L1)."""
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) < self._compress_min_size:
+            return value, blob
+        self._store.count('l2', 'compressed')
+        return Compressed(zlib.compress(blob, self._compress_level)), blob
+
+    @staticmethod
+    def _unpack(stored):
+        """Возвращает (значение, pickle для L1)."""
+        if isinstance(stored, Compressed):
+            blob = zlib.decompress(stored.data)
+            return pickle.loads(blob), blob
+        return stored, pickle.dumps(stored, pickle.HIGHEST_PROTOCOL)
+
+    def _broadcast(self, keys):
+        """Пишет в журнал L2, что keys изменились (CLEAR — все ключи)."""
+        l2 = self._l2
+        try:
+            epoch = l2.incr(EPOCH_KEY)
+        except ValueError:
+            l2.add(EPOCH_KEY, 0, None)
+            epoch = l2.incr(EPOCH_KEY)
+        l2.set(LOG_KEY % (epoch % LOG_SIZE), (epoch, keys), None)
+        with self._store.lock:
+            self._store.own.add(epoch)
+
+    def _sync(self, now):
+        """Выбрасывает из L1 ключи, измененные другими процессами."""
+        store = self._store
+        if now - store.synced < self._sync_interval:
+            return
+        store.synced = now
+        l2 = self._l2
+        current = l2.get(EPOCH_KEY, 0)
+        seen = store.seen
+        if seen is None:
+            # Первая сверка: журнал читается с первой своей записи.
+            seen = min(store.own, default=current + 1) - 1
+        if seen == current:
+            store.seen = seen
+            return
+        if current < seen or current - seen > LOG_SIZE:
+            # Журнал сброшен или отстали больше, чем он хранит.
+            store.clear()
+            store.seen = current
+            return
+        epochs = range(seen + 1, current + 1)
+        log = l2.get_many([LOG_KEY % (epoch % LOG_SIZE) for epoch in epochs])
+        stale = set()
+        for epoch in epochs:
+            record = log.get(LOG_KEY % (epoch % LOG_SIZE))
+            if record is None or record[0] < epoch:
+                # Запись журнала еще не дописана: дочитаем в следующий раз.
+                break
+            seen = epoch
+            if record[0] > epoch or (
+                record[1] is CLEAR and epoch not in store.own
+            ):
+                store.clear()
+                stale.clear()
+            elif epoch not in store.own and record[1] is not CLEAR:
+                stale.update(record[1])
+        with store.lock:
+            store.own = {epoch for epoch in store.own if epoch > seen}
+        store.delete(stale)
+        store.seen = seen
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        now = time.time()
+        self._sync(now)
+        store = self._store
+        found = {}
+        missing = []
+        for key in keys:
+            blob = store.get(self._key(key, version), now)
+            if blob is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(blob)
+        if found:
+            metrics.CACHE_GETS.inc(len(found), tier='l1', result='hit')
+        if not missing:
+            profiling.count_cache(len(found), 0)
+            return found
+        stored = self._l2.get_many(missing, version=version)
+        store.count('l2', 'hits', len(stored))
+        store.count('l2', 'misses', len(missing) - len(stored))
+        profiling.count_cache(
+            len(found) + len(stored), len(missing) - len(stored)
+        )
+        if stored:
+            metrics.CACHE_GETS.inc(len(stored), tier='l2', result='hit')
+        if len(missing) > len(stored):
+            metrics.CACHE_GETS.inc(
+                len(missing) - len(stored), tier='l2', result='miss'
+            )
+        expires = now + self._l1_timeout
+        for key, value in stored.items():
+            found[key], blob = self._unpack(value)
+            store.set(self._key(key, version), blob, expires)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        packed = {}
+        blobs = {}
+        for key, value in data.items():
+            packed[key], blobs[self._key(key, version)] = self._pack(value)
+        failed = self._l2.set_many(packed, timeout, version=version) or []
+        self._broadcast(list(blobs))
+        expires = self._l1_expires(timeout)
+        for key, blob in blobs.items():
+            self._store.set(key, blob, expires)
+        self._store.delete([self._key(key, version) for key in failed])
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        stored, blob = self._pack(value)
+        if not self._l2.add(key, stored, timeout, version=version):
+            return False
+        made = self._key(key, version)
+        self._broadcast([made])
+        self._store.set(made, blob, self._l1_expires(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._l2.incr(key, delta, version=version)
+        made = self._key(key, version)
+        self._store.delete([made])
+        self._broadcast([made])
+        return value
+
+    def has_key(self, key, version=None):
+        if self._store.get(self._key(key, version), time.time()) is not None:
+            return True
+        return self._l2.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._l2.delete_many(keys, version=version)
+        made = [self._key(key, version) for key in keys]
+        self._store.delete(made)
+        self._broadcast(made)
+
+    def clear(self):
+        self._l2.clear()
+        self._store.clear()
+        self._broadcast(CLEAR)
+
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений по уровням."""
+        store = self._store
+        with store.lock:
+            stats = {tier: dict(values) for tier, values in store.stats.items()}
+            stats['l1'].update(size=store.size, entries=len(store.entries))
+        evictions = getattr(self._l2, 'evictions', None)
+        if evictions is not None:
+            stats['l2']['evictions'] = evictions
+        return stats
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
@@ -0,0 +1,361 @@
+"""
+Кеш с инвалидацией по тегам.
+
+Каждая запись помнит версии тегов (лента, группа, автор, пост),
+от которых она зависит. Сброс тега меняет его версию, и все записи
+с этим тегом перестают совпадать — без перебора ключей и без
+ожидания TTL, поэтому TTL можно делать длинным.
+
+Устаревшую запись пересчитывает один процесс (блокировка в кеше),
+остальные тем временем отдают прежнюю копию. Незадолго до истечения
+TTL запись с небольшой вероятностью обновляется заранее (XFetch),
+а при ошибке базы отдается устаревшая копия, если она еще хранится.
+
+Закешированные страницы получают ETag по версиям своих тегов
+и Last-Modified; на условный GET с той же копией у клиента ответ 304
+собирается из кеша без представления, базы и шаблонов. У общих
+страниц (shared) Last-Modified нет: шапка у них своя у каждого
+посетителя, а дата одна на всех, и после входа или подписки
+If-Modified-Since получил бы 304 со старой шапкой.
+"""
+import copy
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core import metrics
+from core.templatetags.holes import decode_hole
+
+logger = logging.getLogger(__name__)
+
+TAG_KEY = 'tag:%s'
+PAGE_KEY = 'page:%s'
+LOCK_KEY = '%s:lock'
+HOLE_RE = re.compile(rb'<!--hole:([A-Za-z0-9_=-]+)-->')
+LOCK_POLL_INTERVAL = 0.05
+ETAG_SALT = 'core.caching.etag'
+# Заголовки общей страницы, которые не переносятся в ответ посетителю:
+# длина меняется с фрагментами, ETag свой, даты у общих страниц нет.
+SHARED_PAGE_HEADERS = ('content-length', 'etag', 'last-modified')
+CONDITIONAL_HEADERS = (
+    'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_MATCH',
+    'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; отсутствующим тегам выдается новая версия."""
+    keys = {TAG_KEY % tag: tag for tag in tags}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+        found[key] = version
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags):
+    """
+    Сбрасывает теги сразу и еще раз после коммита транзакции:
+    иначе параллельный запрос успел бы закешировать данные,
+    прочитанные до коммита, под уже новой версией тега.
+    """
+    def invalidate():
+        cache.set_many(
+            {TAG_KEY % tag: _new_version() for tag in tags}, None
+        )
+    if tags:
+        invalidate()
+        transaction.on_commit(invalidate)
+
+
+def _is_fresh(entry, beta=0):
+    """
+    Запись свежая, если теги не сброшены и TTL не истек.
+    При beta > 0 запись «истекает» раньше срока с вероятностью,
+    растущей к концу TTL и со временем пересчета (XFetch).
+    """
+    if tag_versions(entry['tags']) != entry['tags']:
+        return False
+    if entry['expires'] is None:
+        return True
+    early = -entry['delta'] * beta * math.log(1.0 - random.random())
+    return time.time() + early < entry['expires']
+
+
+def _store(key, value, tags, timeout, stale_ttl=0, delta=0):
+    if not isinstance(tags, dict):
+        tags = tag_versions(tags)
+    entry = {
+        'tags': tags,
+        'value': value,
+        'expires': None if timeout is None else time.time() + timeout,
+        'delta': delta,
+    }
+    cache.set(key, entry, None if timeout is None else timeout + stale_ttl)
+
+
+def get_tagged(key):
+    """Значение по ключу или None, если запись устарела по тегам."""
+    entry = cache.get(key)
+    if entry is None or not _is_fresh(entry):
+        return None
+    return entry['value']
+
+
+def set_tagged(key, value, tags, timeout=None):
+    """
+    Сохраняет значение вместе с версиями тегов.
+    tags — словарь версий, снятых до чтения данных из базы,
+    или список тегов, если такой снимок не нужен.
+    """
+    _store(key, value, tags, timeout)
+
+
+def get_or_compute(
+    key, compute, timeout=None, stale_ttl=0, beta=1.0, lock_timeout=None
+):
+    """
+    Возвращает значение из кеша или пересчитывает его без давки.
+
+    compute() возвращает (значение, теги); теги None — не сохранять.
+    Пересчитывает только процесс, взявший блокировку; остальные
+    отдают устаревшую копию (stale-while-revalidate) или, если копии
+    нет, ждут результата до lock_timeout. Запись хранится еще
+    stale_ttl секунд после истечения TTL — в это время она отдается
+    и при ошибке базы (stale-if-error).
+    """
+    if lock_timeout is None:
+        lock_timeout = settings.CACHE_LOCK_TIMEOUT
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, beta):
+        metrics.TAGGED_CACHE.inc(result='hit')
+        return entry['value']
+    lock_key = LOCK_KEY % key
+    if cache.add(lock_key, True, lock_timeout):
+        try:
+            return _recompute(key, compute, timeout, stale_ttl, entry)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        metrics.TAGGED_CACHE.inc(result='stale')
+        return entry['value']
+    deadline = time.time() + lock_timeout
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry):
+            metrics.TAGGED_CACHE.inc(result='wait')
+            return entry['value']
+        if cache.get(lock_key) is None:
+            # Блокировку отпустили, ничего не сохранив (404, ответ
+            # без тегов, ошибка): ждать больше нечего.
+            break
+    return _recompute(key, compute, timeout, stale_ttl, None)
+
+
+def _recompute(key, compute, timeout, stale_ttl, stale):
+    started = time.time()
+    try:
+        value, tags = compute()
+    except DatabaseError:
+        if stale is None:
+            raise
+        metrics.TAGGED_CACHE.inc(result='error_stale')
+        logger.warning('Отдана устаревшая копия %s: ошибка базы', key,
+                       exc_info=True)
+        return stale['value']
+    metrics.TAGGED_CACHE.inc(result='miss')
+    if tags is not None:
+        _store(key, value, tags, timeout, stale_ttl, time.time() - started)
+    return value
+
+
+def add_cache_tags(request, *tags):
+    """
+    Отмечает, от каких сущностей зависит кешируемый ответ.
+    Версии снимаются в момент вызова, поэтому теги стоит добавлять
+    до запросов к базе.
+    """
+    if hasattr(request, 'cache_tags'):
+        request.cache_tags.update(tag_versions(tags))
+
+
+def page_cache_key(request, vary_on_cookie=False):
+    parts = [request.get_full_path()]
+    if vary_on_cookie:
+        parts.append(request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''))
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return PAGE_KEY % digest
+
+
+def page_etag(key, tags):
+    """ETag страницы: ключ и версии тегов, снятые до ее построения."""
+    versions = '|'.join(f'{tag}={tags[tag]}' for tag in sorted(tags))
+    return quote_etag(hashlib.md5(f'{key}|{versions}'.encode()).hexdigest())
+
+
+def _personal_etag(request, response, shared):
+    """
+    Общая страница дорисовывается под посетителя, поэтому ее ETag
+    зависит еще и от cookie сессии и CSRF.
+    """
+    if not shared:
+        return response['ETag']
+    return quote_etag(salted_hmac(ETAG_SALT, '|'.join([
+        response['ETag'],
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ])).hexdigest())
+
+
+def _conditional(request, response, etag):
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response,
+    )
+
+
+def _not_modified(request, key, shared, vary_on_cookie):
+    """
+    Ответ 304 (или 412) по закешированной странице, если у клиента
+    та же копия, иначе None. Стоит одного чтения кеша и версий тегов.
+    """
+    if not any(header in request.META for header in CONDITIONAL_HEADERS):
+        return None
+    entry = cache.get(key)
+    if entry is None or not _is_fresh(entry):
+        return None
+    cached = entry['value']
+    if not cached.has_header('ETag'):
+        return None
+    validators = HttpResponse()
+    validators['ETag'] = _personal_etag(request, cached, shared)
+    if not shared:
+        validators['Last-Modified'] = cached['Last-Modified']
+    if cached.has_header('Vary'):
+        validators['Vary'] = cached['Vary']
+    if vary_on_cookie or shared:
+        patch_vary_headers(validators, ('Cookie',))
+    response = _conditional(request, validators, validators['ETag'])
+    return None if response is validators else response
+
+
+def fill_holes(request, content, context=None):
+    """Дорисовывает пользовательские фрагменты на месте меток {% hole %}."""
+    def render_hole(match):
+        name, values = decode_hole(match.group(1))
+        return get_template(name).render(
+            {**(context or {}), **values}, request
+        ).encode()
+    return HOLE_RE.sub(render_hole, content)
+
+
+def cache_page_tagged(
+    timeout=None,
+    vary_on_cookie=False,
+    shared=False,
+    personalize=None,
+    stale_ttl=None,
+    beta=1.0,
+):
+    """
+    Замена cache_page: страница живет до timeout или до сброса
+    любого тега, добавленного представлением через add_cache_tags.
+    Ответы без тегов не кешируются. Пересчет идет через
+    get_or_compute, поэтому истекшую страницу строит один процесс.
+
+    С shared=True тело страницы одно на всех посетителей:
+    фрагменты {% hole %} дорисовываются для каждого запроса,
+    personalize(request, *args, **kwargs) дает им контекст
+    (например, подписан ли пользователь на автора).
+
+    Условный GET с ETag или датой закешированной страницы получает
+    304 еще до вызова представления; у общих страниц — только по ETag.
+    """
+    if stale_ttl is None:
+        stale_ttl = settings.PAGE_CACHE_STALE_TTL
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            key = page_cache_key(request, vary_on_cookie and not shared)
+            not_modified = _not_modified(
+                request, key, shared, vary_on_cookie
+            )
+            if not_modified is not None:
+                return not_modified
+
+            def compute():
+                request.cache_tags = {}
+                request.punch_holes = shared
+                response = view(request, *args, **kwargs)
+                if (
+                    response.status_code == 200
+                    and not response.streaming
+                    and request.cache_tags
+                ):
+                    response['ETag'] = page_etag(key, request.cache_tags)
+                    response['Last-Modified'] = http_date()
+                    return response, request.cache_tags
+                return response, None
+
+            response = get_or_compute(
+                key,
+                compute,
+                timeout,
+                stale_ttl,
+                beta,
+            )
+            if shared and not response.streaming:
+                context = personalize(request, *args, **kwargs) if (
+                    personalize is not None
+                    and HOLE_RE.search(response.content)
+                ) else {}
+                personal = HttpResponse(
+                    fill_holes(request, response.content, context),
+                    status=response.status_code,
+                )
+                for header, value in response.items():
+                    if header.lower() not in SHARED_PAGE_HEADERS:
+                        personal[header] = value
+                personal.cookies = copy.deepcopy(response.cookies)
+                if response.has_header('ETag'):
+                    personal['ETag'] = _personal_etag(
+                        request, response, shared
+                    )
+                response = personal
+            if vary_on_cookie or shared:
+                patch_vary_headers(response, ('Cookie',))
+            if response.has_header('ETag'):
+                return _conditional(request, response, response['ETag'])
+            return response
+        return wrapper
+    return decorator
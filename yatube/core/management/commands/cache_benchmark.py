@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import _create_cache
+from django.core.management.base import BaseCommand
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', None),
+    'filebased': (
+        'django.core.cache.backends.filebased.FileBasedCache', 'files'
+    ),
+    'sqlite': ('core.cache_backends.sqlite.SQLiteCache', 'cache.sqlite3'),
+}
+
+
+def build(name, directory):
+    backend, location = BACKENDS[name]
+    if location is None:
+        return _create_cache(backend, LOCATION=name)
+    return _create_cache(backend, LOCATION=os.path.join(directory, location))
+
+
+def worker(name, directory, operations, keys, value_size, results):
+    cache = build(name, directory)
+    value = 'x' * value_size
+    pid = os.getpid()
+    started = time.perf_counter()
+    for number in range(operations):
+        key = f'key:{number % keys}'
+        if number % 10 == 0:
+            cache.set(key, value)
+        else:
+            cache.get(key)
+    elapsed = time.perf_counter() - started
+    cache.set(f'seen:{pid}', True)
+    results.put((pid, elapsed))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность бэкендов кеша '
+        '(90% get, 10% set) под нагрузкой из нескольких процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument(
+            '--backend', action='append', choices=sorted(BACKENDS),
+            help='Какие бэкенды проверять (по умолчанию все).',
+        )
+
+    def handle(self, *args, **options):
+        report = {}
+        for name in options['backend'] or sorted(BACKENDS):
+            directory = tempfile.mkdtemp(prefix='cache-benchmark-')
+            try:
+                report[name] = self.run(name, directory, options)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, name, directory, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                name,
+                directory,
+                options['operations'],
+                options['keys'],
+                options['value_size'],
+                results,
+            ))
+            for _ in range(options['processes'])
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        timings = dict(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        wall = time.perf_counter() - started
+        total = options['operations'] * options['processes']
+        # Видит ли родительский процесс записи, сделанные дочерними.
+        parent = build(name, directory)
+        shared = all(parent.get(f'seen:{pid}') for pid in timings)
+        return {
+            'operations': total,
+            'wall_seconds': round(wall, 3),
+            'ops_per_second': round(total / wall),
+            'slowest_worker_seconds': round(max(timings.values()), 3),
+            'shared_between_processes': shared,
+        }
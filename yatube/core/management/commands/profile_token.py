@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import PROFILERS, make_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Выдает значение заголовка X-Profile, с которым запрос '
+        'профилируется и профиль сохраняется в PROFILING_DIR.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiler', choices=PROFILERS, default=PROFILERS[0],
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token(options['profiler']))
+        self.stderr.write(
+            'Действует {} с.: curl -H "X-Profile: <токен>" ...'.format(
+                settings.PROFILING_TOKEN_MAX_AGE
+            )
+        )
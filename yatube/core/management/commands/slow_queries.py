@@ -0,0 +1,72 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def aggregate(lines):
+    """Сводка журнала по отпечаткам запросов."""
+    offenders = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        offender = offenders.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'sql': None,
+            'plan': None,
+        })
+        offender['count'] += entry['count']
+        offender['total_ms'] += entry['total_ms']
+        offender['max_ms'] = max(offender['max_ms'], entry['max_ms'])
+        if entry.get('view'):
+            offender['views'].add(entry['view'])
+        if entry.get('sql'):
+            offender['sql'] = entry['sql']
+            offender['plan'] = entry.get('plan')
+            offender['source'] = entry.get('source')
+            offender['template'] = entry.get('template')
+    return sorted(
+        offenders.values(), key=lambda item: item['total_ms'], reverse=True
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Самые дорогие медленные запросы из SLOW_QUERY_LOG '
+        'по суммарному времени.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--plan', action='store_true', help='Показать планы запросов.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['log'], encoding='utf-8') as file:
+                offenders = aggregate(file)
+        except FileNotFoundError:
+            raise CommandError(f'Нет журнала {options["log"]}')
+        for offender in offenders[:options['limit']]:
+            self.stdout.write(
+                '{fingerprint}  {total_ms:.0f} мс всего, {count} раз, '
+                'максимум {max_ms:.0f} мс'.format(**offender)
+            )
+            details = [
+                ', '.join(sorted(offender['views'])),
+                offender.get('source'),
+                offender.get('template'),
+            ]
+            self.stdout.write('  ' + ' | '.join(filter(None, details)))
+            self.stdout.write(f'  {offender["sql"]}')
+            if options['plan'] and offender['plan']:
+                for row in offender['plan']:
+                    self.stdout.write(f'    {row}')
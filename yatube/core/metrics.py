@@ -0,0 +1,338 @@
+"""
+Метрики процесса в формате Prometheus.
+
+Счетчики, датчики и гистограммы с фиксированными корзинами живут
+в памяти процесса и защищены блокировкой. Каждый процесс не чаще
+раза в METRICS_FLUSH_INTERVAL секунд сбрасывает свой снимок в файл
+METRICS_DIR/<pid>.json (атомарно, через переименование), а /metrics/
+складывает снимки всех процессов: так видны все WSGI-воркеры, какой
+бы из них ни ответил на запрос. Счетчики и гистограммы завершившихся
+процессов продолжают учитываться (сложенными в один файл RETIRED),
+датчики — только у живых.
+
+Метрики объявляются на уровне модуля; ниже — метрики представлений,
+кеша и базы, которые собирают MetricsMiddleware, TieredCache,
+get_or_compute и обертка курсора из CoreConfig.ready().
+"""
+import fcntl
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Сложенные счетчики завершившихся процессов и блокировка сборщиков.
+RETIRED = 'retired.json'
+LOCK = 'collect.lock'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидаются метки {self.labelnames}'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                json.dumps(key): (
+                    list(value) if isinstance(value, list) else value
+                )
+                for key, value in self.values.items()
+            }
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Значение — [счетчики корзин..., +Inf, сумма]."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = len(self.buckets)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                position = index
+                break
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 2)
+            counts[position] += 1
+            counts[-1] += value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f'Метрика {metric.name} уже объявлена')
+            self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot() for name, metric in self.metrics.items()
+        }
+
+    def flush(self, force=False):
+        """Сбрасывает снимок процесса в METRICS_DIR, если пора."""
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        _write(directory, f'{os.getpid()}.json', self.snapshot())
+
+    def collect(self):
+        """
+        Снимки всех процессов, сложенные по метрикам и меткам.
+        Счетчики и гистограммы завершившихся процессов переносятся
+        в RETIRED, а их снимки удаляются: иначе каталог растет с каждым
+        перезапуском воркеров. Сборщики идут по очереди (flock), чтобы
+        снимок не учелся дважды.
+        """
+        self.flush(force=True)
+        directory = settings.METRICS_DIR
+        merged = {name: {} for name in self.metrics}
+        with _locked(directory):
+            retired_path = os.path.join(directory, RETIRED)
+            retired = _read(retired_path) or {}
+            dead = []
+            for filename in os.listdir(directory):
+                pid = _pid(filename)
+                if pid is None:
+                    continue
+                path = os.path.join(directory, filename)
+                snapshot = _read(path)
+                if _alive(pid):
+                    self._merge(merged, snapshot or {})
+                    continue
+                dead.append(path)
+                self._merge(retired, snapshot or {}, gauges=False)
+            if dead:
+                _write(directory, RETIRED, retired)
+                for path in dead:
+                    os.remove(path)
+        self._merge(merged, retired, gauges=False)
+        return merged
+
+    def _merge(self, total, snapshot, gauges=True):
+        for name, samples in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not gauges):
+                continue
+            into = total.setdefault(name, {})
+            for key, value in samples.items():
+                into[key] = _add(into.get(key), value)
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        lines = []
+        for name, samples in sorted(self.collect().items()):
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(samples.items()):
+                labels = dict(zip(metric.labelnames, json.loads(key)))
+                if metric.kind == 'histogram':
+                    lines.extend(_histogram_lines(metric, labels, value))
+                else:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid(filename):
+    """pid из имени снимка <pid>.json; None для остальных файлов."""
+    name, extension = os.path.splitext(filename)
+    if extension != '.json' or not name.isdigit():
+        return None
+    return int(name)
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(directory, filename, data):
+    """Атомарная запись JSON: через временный файл и переименование."""
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, os.path.join(directory, filename))
+
+
+@contextmanager
+def _locked(directory):
+    with open(os.path.join(directory, LOCK), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _add(total, value):
+    if total is None:
+        return value
+    if isinstance(value, list):
+        return [left + right for left, right in zip(total, value)]
+    return total + value
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _histogram_lines(metric, labels, counts):
+    cumulative = 0
+    for bound, count in zip((*metric.buckets, math.inf), counts):
+        cumulative += count
+        bucket = {**labels, 'le': _number(float(bound))}
+        yield f'{metric.name}_bucket{_labels(bucket)} {cumulative}'
+    yield f'{metric.name}_sum{_labels(labels)} {_number(counts[-1])}'
+    yield f'{metric.name}_count{_labels(labels)} {cumulative}'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по представлениям.',
+    ('view', 'method', 'status'),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'yatube_requests_in_progress',
+    'Запросы, которые обрабатываются сейчас.',
+)
+CACHE_GETS = Counter(
+    'yatube_cache_gets_total',
+    'Чтения из кеша по уровням (l1 — память процесса, l2 — общий).',
+    ('tier', 'result'),
+)
+TAGGED_CACHE = Counter(
+    'yatube_tagged_cache_total',
+    'Исходы get_or_compute: hit, stale, wait, miss, error_stale.',
+    ('result',),
+)
+DB_QUERIES = Histogram(
+    'yatube_db_query_duration_seconds',
+    'Время запросов к базе.',
+    ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0),
+)
+
+
+def database_wrapper(alias):
+    """Обертка курсора для connection.execute_wrappers."""
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            DB_QUERIES.observe(time.perf_counter() - started, alias=alias)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """Время ответа каждого представления и число запросов в работе."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            REQUESTS_IN_PROGRESS.inc(-1)
+            match = request.resolver_match
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                view=match.view_name if match else '<unresolved>',
+                method=request.method,
+                status=status,
+            )
+            REGISTRY.flush()
@@ -0,0 +1,262 @@
+"""
+Профилирование запросов, которое можно держать включенным в продакшене.
+
+ProfilingMiddleware считает для каждого запроса время и число
+запросов к базе, время рендеринга шаблонов, попадания и промахи
+кеша и общее время ответа. Итог уходит в заголовок Server-Timing
+(его показывает вкладка Network в браузере) и, для доли запросов
+PROFILING_LOG_SAMPLE_RATE и для всех медленных, в лог одной строкой
+JSON. У потоковых ответов (JSON-ленты) база читается уже после
+отправки заголовков, поэтому Server-Timing у них нет, а строка лога
+пишется, когда тело отдано целиком.
+
+Полный профиль (cProfile или pyinstrument, если он установлен)
+снимается только для запроса с заголовком X-Profile, подписанным
+SECRET_KEY (его выдает manage.py profile_token), и сохраняется
+в PROFILING_DIR.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.crypto import get_random_string
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'core.profiling'
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_current = ContextVar('profiling', default=None)
+
+
+class Timings:
+    """Счетчики одного запроса."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.templates = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'db_ms': round(self.db * 1000, 2),
+            'queries': self.queries,
+            'templates_ms': round(self.templates * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    """Счетчики текущего запроса или None вне ProfilingMiddleware."""
+    return _current.get()
+
+
+def count_cache(hits, misses):
+    timings = _current.get()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+def _timed_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def _instrument_templates():
+    """
+    Оборачивает рендеринг шаблона верхнего уровня (render,
+    render_to_string); {% include %} считается внутри него.
+    """
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    def timed_render(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.templates += time.perf_counter() - started
+
+    timed_render.profiled = True
+    Template.render = timed_render
+
+
+def make_token(profiler='cprofile'):
+    """Значение заголовка X-Profile, которое включает профилировщик."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(profiler)
+
+
+def requested_profiler(request):
+    """Профилировщик из подписанного заголовка X-Profile или None."""
+    token = request.META.get(PROFILE_HEADER)
+    if not token:
+        return None
+    try:
+        profiler = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return profiler if profiler in PROFILERS else None
+
+
+def _profile_path(request, extension):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = '{}-{}-{}.{}'.format(
+        time.strftime('%Y%m%d-%H%M%S'),
+        request.path.strip('/').replace('/', '_') or 'index',
+        get_random_string(6),
+        extension,
+    )
+    return os.path.join(settings.PROFILING_DIR, name)
+
+
+def _run_profiled(profiler, request, get_response):
+    """Выполняет запрос под профилировщиком, возвращает (ответ, файл)."""
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            profiler = 'cprofile'
+        else:
+            instrument = Profiler()
+            instrument.start()
+            try:
+                response = get_response(request)
+            finally:
+                instrument.stop()
+            path = _profile_path(request, 'html')
+            with open(path, 'w') as file:
+                file.write(instrument.output_html())
+            return response, path
+    profile = cProfile.Profile()
+    try:
+        response = profile.runcall(get_response, request)
+    finally:
+        path = _profile_path(request, 'prof')
+        profile.dump_stats(path)
+    return response, path
+
+
+@contextmanager
+def _measuring(timings):
+    """Считает запросы к базе и шаблоны внутри блока в timings."""
+    token = _current.set(timings)
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(_timed_query)
+                )
+            yield
+    finally:
+        _current.reset(token)
+
+
+class ProfilingMiddleware:
+    """Ставится первым в MIDDLEWARE, чтобы видеть весь запрос."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        timings = Timings(request)
+        profiler = requested_profiler(request)
+        path = None
+        with _measuring(timings):
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response, path = _run_profiled(
+                    profiler, request, self.get_response
+                )
+        if path is not None:
+            response['X-Profile-File'] = os.path.basename(path)
+        if response.streaming:
+            response.streaming_content = self.streamed(
+                iter(response.streaming_content),
+                request, response, timings, path,
+            )
+            return response
+        timings.total = time.perf_counter() - timings.started
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing()
+        self.log(request, response, timings, path)
+        return response
+
+    def streamed(self, content, request, response, timings, path):
+        """
+        Тело потокового ответа, каждый кусок которого измеряется:
+        запросы к базе идут по мере отдачи. Заголовки к этому времени
+        уже отправлены, поэтому итог — только в логе, после конца тела.
+        """
+        try:
+            while True:
+                with _measuring(timings):
+                    chunk = next(content, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            timings.total = time.perf_counter() - timings.started
+            self.log(request, response, timings, path)
+
+    def log(self, request, response, timings, path):
+        slow = timings.total * 1000 >= settings.PROFILING_SLOW_REQUEST_MS
+        if not (
+            slow or path is not None
+            or random.random() < settings.PROFILING_LOG_SAMPLE_RATE
+        ):
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'slow': slow,
+            **timings.as_dict(),
+        }
+        if path is not None:
+            record['profile'] = os.path.basename(path)
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
@@ -0,0 +1,175 @@
+"""
+Журнал медленных запросов к базе.
+
+Обертка курсора (CoreConfig.ready() ставит ее на каждое соединение)
+замечает запросы дольше SLOW_QUERY_MS и пишет в лог core.slow_queries
+строку JSON: SQL, план (EXPLAIN QUERY PLAN для SELECT), представление,
+строку шаблона и строку кода, откуда пришел запрос.
+
+Одинаковые запросы (с точностью до значений параметров — отпечаток
+нормализованного SQL) попадают в лог не чаще раза в
+SLOW_QUERY_LOG_INTERVAL секунд; пропущенные повторы суммируются
+в count и total_ms следующей записи, поэтому сумма по логу — полная
+статистика. Ее сводку показывает manage.py slow_queries.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Node
+
+from core import profiling
+
+logger = logging.getLogger(__name__)
+
+_explaining = ContextVar('slow_queries_explaining', default=False)
+_lock = threading.Lock()
+_pending = {}
+_logged = {}
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    """SQL без значений: по нему совпадают одинаковые запросы."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:12]
+
+
+def _explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    token = _explaining.set(True)
+    try:
+        # Курсор бэкенда, без оберток Django: план не считается
+        # запросом и не попадает в сами обертки.
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(
+                connection.ops.explain_query_prefix() + ' ' + sql, params
+            )
+            return [' '.join(map(str, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        _explaining.reset(token)
+
+
+def _origin():
+    """(строка шаблона, строка кода проекта), откуда выполнен запрос."""
+    template = source = None
+    frame = sys._getframe(2)
+    while frame is not None and (template is None or source is None):
+        node = frame.f_locals.get('self')
+        if template is None and isinstance(node, Node) and getattr(
+            node, 'origin', None
+        ) is not None and getattr(node, 'token', None) is not None:
+            template = f'{node.origin.template_name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            source is None
+            and filename.startswith(settings.BASE_DIR)
+            and filename != __file__
+        ):
+            source = '{}:{} {}'.format(
+                os.path.relpath(filename, settings.BASE_DIR),
+                frame.f_lineno,
+                frame.f_code.co_name,
+            )
+        frame = frame.f_back
+    return template, source
+
+
+def _view():
+    timings = profiling.current()
+    request = getattr(timings, 'request', None)
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def record(connection, sql, params, many, elapsed):
+    """Учитывает медленный запрос и пишет его в лог, если пора."""
+    key = fingerprint(sql)
+    milliseconds = elapsed * 1000
+    now = time.monotonic()
+    with _lock:
+        stats = _pending.setdefault(
+            key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        )
+        stats['count'] += 1
+        stats['total_ms'] += milliseconds
+        stats['max_ms'] = max(stats['max_ms'], milliseconds)
+        last = _logged.get(key)
+        if last is not None and now - last < settings.SLOW_QUERY_LOG_INTERVAL:
+            return
+        _logged[key] = now
+        del _pending[key]
+    template, source = _origin()
+    _emit({
+        'fingerprint': key,
+        'duration_ms': round(milliseconds, 2),
+        'count': stats['count'],
+        'total_ms': round(stats['total_ms'], 2),
+        'max_ms': round(stats['max_ms'], 2),
+        'alias': connection.alias,
+        'view': _view(),
+        'template': template,
+        'source': source,
+        'sql': sql,
+        'params': None if many else [str(param) for param in params or ()],
+        'plan': None if many else _explain(connection, sql, params),
+    })
+
+
+def _emit(entry):
+    logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+@atexit.register
+def flush():
+    """Дописывает в лог повторы, накопленные с последней записи."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for key, stats in pending.items():
+        _emit({
+            'fingerprint': key,
+            'count': stats['count'],
+            'total_ms': round(stats['total_ms'], 2),
+            'max_ms': round(stats['max_ms'], 2),
+        })
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """Обертка курсора для connection.execute_wrappers."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if (
+            elapsed * 1000 >= settings.SLOW_QUERY_MS
+            and not _explaining.get()
+        ):
+            record(context['connection'], sql, params, many, elapsed)
@@ -0,0 +1,103 @@
+"""
+Хранилище файлов по содержимому.
+
+Имя файла — sha256 содержимого в каталоге из upload_to
+('posts/ab/ab12….jpg'), поэтому одна и та же картинка хранится
+один раз, сколько бы раз ее ни загрузили, а миниатюры, которые
+sorl привязывает к имени исходника, строятся для нее тоже один раз.
+Удалять такие файлы можно, только когда на них не осталось ссылок.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Имя все равно заменит хеш, а одинаковое имя — одинаковое
+        # содержимое, так что суффиксы не нужны.
+        return name
+
+    def hashed_name(self, name, digest):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+            return
+        old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(
+                directory, self.directory_permissions_mode, exist_ok=True
+            )
+        finally:
+            os.umask(old_umask)
+
+    def _store(self, name, temporary):
+        """Дает временному файлу имя name или удаляет его, если он уже есть."""
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(temporary)
+            # Свежее время изменения не дает сборщику удалить
+            # файл, пока новая ссылка на него еще не сохранена.
+            os.utime(full_path)
+            return
+        self._makedirs(os.path.dirname(full_path))
+        # mkstemp создает файл с правами 0600.
+        os.chmod(temporary, self.file_permissions_mode or 0o644)
+        os.replace(temporary, full_path)
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        self._makedirs(directory)
+        if getattr(content, 'sha256', None) and hasattr(
+            content, 'temporary_file_path'
+        ):
+            # Загрузку уже записал на диск и хешировал ImageUploadHandler:
+            # файл не перечитывается, а копируется рядом и переименовывается.
+            name = self.hashed_name(name, content.sha256)
+            if os.path.exists(self.path(name)):
+                os.utime(self.path(name))
+                return name
+            fd, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+            os.close(fd)
+            try:
+                file_move_safe(
+                    content.temporary_file_path(), temporary,
+                    allow_overwrite=True,
+                )
+                self._store(name, temporary)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                raise
+            return name
+        # Содержимое пишется во временный файл и хешируется за один
+        # проход, затем файл атомарно получает имя по хешу.
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = self.hashed_name(name, digest.hexdigest())
+            self._store(name, temporary)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        return name
@@ -0,0 +1,63 @@
+import base64
+import json
+
+from django import template
+from django.template.base import token_kwargs
+
+register = template.Library()
+
+HOLE_MARKER = '<!--hole:%s-->'
+
+
+def encode_hole(name, values):
+    payload = json.dumps([name, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_hole(marker):
+    return json.loads(base64.urlsafe_b64decode(marker).decode())
+
+
+class HoleNode(template.Node):
+    def __init__(self, name, extra_context):
+        self.name = name
+        self.extra_context = extra_context
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        values = {
+            key: value.resolve(context)
+            for key, value in self.extra_context.items()
+        }
+        request = context.get('request')
+        if getattr(request, 'punch_holes', False):
+            return HOLE_MARKER % encode_hole(name, values)
+        hole = context.template.engine.get_template(name)
+        with context.push(**values):
+            return hole.render(context)
+
+
+@register.tag
+def hole(parser, token):
+    """
+    Пользовательский фрагмент общей закешированной страницы.
+
+    {% hole 'includes/header.html' post_id=post.id %}
+
+    Обычно работает как include. Когда страница рендерится для общего
+    кеша, вместо фрагмента остается метка, а сам фрагмент дорисовывается
+    для каждого запроса отдельно. Поэтому шаблон фрагмента может
+    опираться только на request, user, csrf_token и переданные
+    значения, а значения должны сериализоваться в JSON.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            '%r tag takes at least one argument: the template name' % bits[0]
+        )
+    extra_context = token_kwargs(bits[2:], parser)
+    if len(extra_context) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            '%r tag accepts only keyword arguments' % bits[0]
+        )
+    return HoleNode(parser.compile_filter(bits[1]), extra_context)
@@ -0,0 +1,105 @@
+"""
+Окружение для тестов и замеров, которое не трогает файлы сайта.
+
+isolated_caches() подменяет CACHES копией, в которой файловые кеши
+лежат во временном каталоге: cache.clear() и ключи тестов не
+задевают рабочий кеш. isolated_files() так же уводит загрузки,
+журнал медленных запросов, снимки метрик и профили. TestRunner
+(settings.TEST_RUNNER) включает и то и другое на весь прогон тестов.
+"""
+import copy
+import logging.config
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from core import slow_queries
+
+FILE_BACKENDS = (
+    'core.cache_backends.sqlite.SQLiteCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+# Настройки с путями, которые процессы пишут во время работы.
+FILE_SETTINGS = (
+    'MEDIA_ROOT', 'SLOW_QUERY_LOG', 'PROFILING_LOG', 'METRICS_DIR',
+    'PROFILING_DIR',
+)
+
+
+def temporary_caches(directory):
+    """Копия settings.CACHES с файлами кешей в directory."""
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, params in caches.items():
+        if params['BACKEND'] in FILE_BACKENDS:
+            params['LOCATION'] = os.path.join(
+                directory, alias + os.path.splitext(params['LOCATION'])[1]
+            )
+    return caches
+
+
+@contextmanager
+def isolated_caches():
+    """
+    Кеши на время блока — во временном каталоге. override_settings
+    сбрасывает django.core.cache.caches при входе и выходе, так что
+    бэкенды создаются заново с новыми путями.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        with override_settings(CACHES=temporary_caches(directory)):
+            yield directory
+
+
+def _moved(directory, path):
+    return os.path.join(directory, os.path.basename(path))
+
+
+def temporary_logging(directory):
+    """Копия settings.LOGGING с файлами обработчиков в directory."""
+    config = copy.deepcopy(settings.LOGGING)
+    for handler in config.get('handlers', {}).values():
+        if 'filename' in handler:
+            handler['filename'] = _moved(directory, handler['filename'])
+    return config
+
+
+@contextmanager
+def isolated_files():
+    """
+    FILE_SETTINGS и файлы обработчиков логов — во временном каталоге.
+    Обработчики создаются при настройке логов, поэтому логи
+    перенастраиваются по копии LOGGING, а на выходе — обратно,
+    после того как накопленные повторы медленных запросов записаны
+    во временный журнал (иначе их допишет atexit в рабочий).
+    """
+    original = settings.LOGGING
+    with tempfile.TemporaryDirectory() as directory:
+        config = temporary_logging(directory)
+        paths = {
+            name: _moved(directory, getattr(settings, name))
+            for name in FILE_SETTINGS
+        }
+        with override_settings(LOGGING=config, **paths):
+            logging.config.dictConfig(config)
+            try:
+                yield directory
+            finally:
+                slow_queries.flush()
+                logging.config.dictConfig(original)
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты с кешами, логами и метриками вне BASE_DIR."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolation = ExitStack()
+        self._isolation.enter_context(isolated_caches())
+        self._isolation.enter_context(isolated_files())
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolation.close()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import _create_cache, caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends.tiered import Compressed
+
+BACKEND = 'core.cache_backends.sqlite.SQLiteCache'
+
+
+def increment(location, times):
+    cache = _create_cache(BACKEND, LOCATION=location)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.create()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create(self, **options):
+        return _create_cache(
+            BACKEND, LOCATION=self.location, OPTIONS=options
+        )
+
+    def test_get_set_delete(self):
+        """Запись читается, удаляется и переживает пересоздание кеша."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.create().get('key'), {'value': 1})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_only_missing_or_expired(self):
+        """add() не перезаписывает живую запись, но занимает истекшую."""
+        self.assertTrue(self.cache.add('lock', 1, 60))
+        self.assertFalse(self.cache.add('lock', 2, 60))
+        self.cache.set('expired', 1, 0.01)
+        time.sleep(0.02)
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+    def test_expiry(self):
+        self.cache.set('key', 1, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_cull_least_recently_used(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.create(MAX_SIZE=20000, TOUCH_INTERVAL=0)
+        cache.set('hot', 'x' * 1000)
+        for number in range(30):
+            cache.get('hot')
+            cache.set(f'cold:{number}', 'x' * 1000)
+        self.assertLessEqual(cache.size(), 20000)
+        self.assertEqual(cache.get('hot'), 'x' * 1000)
+        self.assertIsNone(cache.get('cold:0'))
+
+    def test_incr_shared_between_processes(self):
+        """incr() атомарен для нескольких процессов."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        name = uuid.uuid4().hex
+
+        def tier(**options):
+            return {
+                'BACKEND': 'core.cache_backends.tiered.TieredCache',
+                'LOCATION': f'{name}:{uuid.uuid4().hex}',
+                'OPTIONS': {'L2': 'shared', 'SYNC_INTERVAL': 0, **options},
+            }
+
+        settings = override_settings(CACHES={
+            'default': tier(),
+            'other': tier(),
+            'small': tier(L1_MAX_SIZE=3000, COMPRESS_MIN_SIZE=10 ** 6),
+            'shared': {
+                'BACKEND': BACKEND,
+                'LOCATION': os.path.join(self.directory, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache = caches['default']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_l1_hit_skips_l2(self):
+        """Повторное чтение обслуживается из памяти процесса."""
+        self.cache.set('key', 'value')
+        caches['shared'].set('key', 'changed behind l1')
+        self.assertEqual(self.cache.get('key'), 'value')
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1']['hits'], 1)
+        self.assertEqual(stats['l2']['hits'], 0)
+
+    def test_l2_hit_promoted_to_l1(self):
+        caches['shared'].set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        stats = self.cache.stats()
+        self.assertEqual(stats['l2']['hits'], 1)
+        self.assertEqual(stats['l1']['hits'], 1)
+
+    def test_write_invalidates_other_l1(self):
+        """Запись через один L1 выбрасывает ключ из остальных."""
+        other = caches['other']
+        self.cache.set('key', 'old')
+        self.assertEqual(other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(other.get('key'), 'new')
+        self.cache.delete('key')
+        self.assertIsNone(other.get('key'))
+        other.set('key', 'again')
+        self.cache.clear()
+        self.assertIsNone(other.get('key'))
+
+    def test_large_values_compressed_in_l2(self):
+        value = 'x' * 10000
+        self.cache.set('page', value)
+        self.assertIsInstance(caches['shared'].get('page'), Compressed)
+        self.assertEqual(caches['other'].get('page'), value)
+        self.cache.set('small', 'x')
+        self.assertEqual(caches['shared'].get('small'), 'x')
+
+    def test_l1_bounded_by_bytes(self):
+        """L1 вытесняет давно не читанные записи сверх L1_MAX_SIZE."""
+        small = caches['small']
+        for number in range(5):
+            small.set(number, 'x' * 1000)
+        stats = small.stats()
+        self.assertLessEqual(stats['l1']['size'], 3000)
+        self.assertEqual(stats['l1']['evictions'], 3)
+        self.assertEqual(small.get(0), 'x' * 1000)
+        self.assertEqual(small.stats()['l2']['hits'], 1)
+
+
+class TestCachesTests(SimpleTestCase):
+    def test_tests_do_not_use_site_cache(self):
+        """Тесты пишут кеш во временный каталог, а не в BASE_DIR."""
+        location = settings.CACHES['shared']['LOCATION']
+        self.assertFalse(location.startswith(settings.BASE_DIR))
+        self.assertEqual(caches['shared']._path, location)
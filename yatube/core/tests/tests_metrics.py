@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import RETIRED, Counter, Gauge, Histogram, Registry
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.registry = Registry()
+
+    def test_counter_is_thread_safe(self):
+        counter = Counter('hits', 'Попадания.', registry=self.registry)
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn('hits 8000', self.registry.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram(
+            'latency', 'Время.', ('view',), buckets=(0.1, 1),
+            registry=self.registry,
+        )
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, view='index')
+        lines = self.registry.render().splitlines()
+        self.assertIn('latency_bucket{view="index",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{view="index",le="1.0"} 2', lines)
+        self.assertIn('latency_bucket{view="index",le="+Inf"} 3', lines)
+        self.assertIn('latency_sum{view="index"} 5.55', lines)
+        self.assertIn('latency_count{view="index"} 3', lines)
+
+    def test_processes_are_aggregated(self):
+        """Счетчики завершившегося процесса учитываются, датчики — нет."""
+        counter = Counter('jobs', 'Задачи.', registry=self.registry)
+        gauge = Gauge('busy', 'Занятость.', registry=self.registry)
+
+        def child():
+            counter.inc(2)
+            gauge.set(5)
+            self.registry.flush(force=True)
+
+        process = multiprocessing.get_context('fork').Process(target=child)
+        process.start()
+        process.join()
+        counter.inc()
+        gauge.set(1)
+        output = self.registry.render()
+        self.assertIn('jobs 3', output)
+        self.assertIn('busy 1', output)
+        # Снимок завершившегося процесса сложен в RETIRED и удален.
+        self.assertNotIn(f'{process.pid}.json', os.listdir(self.directory))
+        self.assertIn(RETIRED, os.listdir(self.directory))
+        self.assertIn('jobs 3', self.registry.render())
+
+    def test_stray_files_are_skipped(self):
+        counter = Counter('jobs', 'Задачи.', registry=self.registry)
+        counter.inc()
+        for filename in ('backup.json', 'notes.txt', '12.json.tmp'):
+            with open(os.path.join(self.directory, filename), 'w') as file:
+                file.write('{}')
+        self.assertIn('jobs 1', self.registry.render())
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_views_cache_and_database_are_exported(self):
+        with self.settings(METRICS_DIR=self.directory):
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        output = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index",'
+            'method="GET",status="200"}', output
+        )
+        self.assertIn('yatube_tagged_cache_total{result="miss"}', output)
+        self.assertIn('yatube_cache_gets_total{tier="l2"', output)
+        self.assertIn('yatube_db_query_duration_seconds_count', output)
+
+    def test_forbidden_outside_internal_ips(self):
+        with self.settings(METRICS_DIR=self.directory):
+            response = self.client.get(
+                reverse('core:metrics'), REMOTE_ADDR='10.0.0.1'
+            )
+            self.assertEqual(response.status_code, 403)
+            with self.settings(METRICS_TOKEN='secret'):
+                response = self.client.get(
+                    reverse('core:metrics'), REMOTE_ADDR='10.0.0.1',
+                    HTTP_AUTHORIZATION='Bearer secret',
+                )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import TimestampSigner
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import make_token
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+
+    def log_lines(self):
+        if not os.path.exists(settings.PROFILING_LOG):
+            return []
+        with open(settings.PROFILING_LOG) as file:
+            return file.readlines()
+
+    def test_server_timing(self):
+        """Запросы, шаблоны и кеш текущего запроса попадают в заголовок."""
+        response = self.client.get(reverse('posts:index'))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'tpl', 'cache', 'total'})
+        self.assertRegex(timings['db'], r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertNotIn('dur=0.0', timings['tpl'])
+        self.assertIn('miss=', timings['cache'])
+
+    @override_settings(PROFILING_LOG_SAMPLE_RATE=1)
+    def test_sampled_log(self):
+        """Выборка пишется в PROFILING_LOG настроенным логгером."""
+        self.client.get(reverse('posts:index'))
+        record = json.loads(self.log_lines()[-1])
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertFalse(record['slow'])
+        self.assertIn('queries', record)
+
+    @override_settings(PROFILING_LOG_SAMPLE_RATE=1)
+    def test_streaming_response_measured_to_the_end(self):
+        """Запросы потокового ответа учитываются, когда тело отдано."""
+        response = self.client.get(reverse('posts:api_posts'))
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Server-Timing'))
+        logged = self.log_lines()
+        b''.join(response.streaming_content)
+        lines = self.log_lines()
+        self.assertEqual(len(lines), len(logged) + 1)
+        record = json.loads(lines[-1])
+        self.assertEqual(record['view'], 'posts:api_posts')
+        self.assertGreaterEqual(record['queries'], 1)
+
+    def test_profile_only_with_signed_header(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with self.settings(PROFILING_DIR=directory):
+            forged = TimestampSigner(salt='other').sign('cprofile')
+            response = self.client.get(
+                reverse('posts:index'), HTTP_X_PROFILE=forged
+            )
+            self.assertNotIn('X-Profile-File', response)
+            self.assertEqual(os.listdir(directory), [])
+            response = self.client.get(
+                reverse('posts:index'), HTTP_X_PROFILE=make_token()
+            )
+        self.assertEqual(
+            os.listdir(directory), [response['X-Profile-File']]
+        )
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import slow_queries
+from posts.models import Post, User
+
+
+def entries(logs, fingerprint=None):
+    found = [json.loads(record.getMessage()) for record in logs.records]
+    if fingerprint is None:
+        return found
+    return [entry for entry in found if entry['fingerprint'] == fingerprint]
+
+
+@override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG_INTERVAL=60)
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Azazello')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        slow_queries._pending.clear()
+        slow_queries._logged.clear()
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a''b'"
+            ),
+            slow_queries.fingerprint(
+                'SELECT *  FROM t\nWHERE id IN (%s) AND name = %s'
+            ),
+        )
+        self.assertNotEqual(
+            slow_queries.fingerprint('SELECT * FROM t WHERE id = 1'),
+            slow_queries.fingerprint('SELECT * FROM u WHERE id = 1'),
+        )
+
+    def test_logs_plan_and_origin(self):
+        with self.assertLogs('core.slow_queries') as logs:
+            list(Post.objects.filter(author=self.author))
+        entry = entries(logs)[0]
+        self.assertIn('posts_post', entry['sql'])
+        self.assertEqual(entry['params'], [str(self.author.pk)])
+        self.assertTrue(entry['plan'])
+        self.assertIn('core/tests/tests_slow_queries.py', entry['source'])
+        self.assertIsNone(entry['view'])
+
+    def test_view_and_template(self):
+        # Сессия и пользователь читаются лениво, уже в шаблоне.
+        self.client.force_login(self.author)
+        with self.assertLogs('core.slow_queries') as logs:
+            self.client.get(reverse('posts:index'))
+        logged = entries(logs)
+        self.assertTrue(
+            all(entry['view'] == 'posts:index' for entry in logged)
+        )
+        self.assertTrue(any(entry['template'] for entry in logged))
+
+    def test_repeats_are_rate_limited(self):
+        sql = 'SELECT COUNT(*) FROM posts_post WHERE id > %s'
+        key = slow_queries.fingerprint(sql)
+        with self.assertLogs('core.slow_queries') as logs:
+            for minimum in range(3):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [minimum])
+            slow_queries.flush()
+        first, repeats = entries(logs, key)
+        self.assertEqual(first['count'], 1)
+        self.assertEqual(repeats['count'], 2)
+        self.assertNotIn('sql', repeats)
+
+    def test_command_top_offenders(self):
+        lines = [
+            {'fingerprint': 'cheap', 'count': 5, 'total_ms': 100.0,
+             'max_ms': 30.0, 'view': 'posts:index', 'sql': 'SELECT 1',
+             'plan': None},
+            {'fingerprint': 'costly', 'count': 1, 'total_ms': 900.0,
+             'max_ms': 900.0, 'view': 'posts:search', 'sql': 'SELECT 2',
+             'plan': ['SCAN posts_post']},
+            {'fingerprint': 'costly', 'count': 2, 'total_ms': 600.0,
+             'max_ms': 400.0},
+        ]
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.log', delete=False
+        ) as file:
+            file.write('\n'.join(json.dumps(line) for line in lines))
+        self.addCleanup(os.remove, file.name)
+        output = tempfile.SpooledTemporaryFile(mode='w+')
+        call_command('slow_queries', log=file.name, plan=True, stdout=output)
+        output.seek(0)
+        text = output.read()
+        self.assertLess(text.index('costly'), text.index('cheap'))
+        self.assertIn('1500 мс всего, 3 раз', text)
+        self.assertIn('SCAN posts_post', text)
+
+
+class TestLogTests(TestCase):
+    def test_tests_do_not_write_to_base_dir(self):
+        """Журнал, метрики и профили тестов — вне BASE_DIR."""
+        for name in ('SLOW_QUERY_LOG', 'PROFILING_LOG', 'METRICS_DIR',
+                     'PROFILING_DIR'):
+            with self.subTest(name=name):
+                self.assertFalse(
+                    getattr(settings, name).startswith(settings.BASE_DIR)
+                )
+        [handler] = logging.getLogger('core.slow_queries').handlers
+        self.assertEqual(handler.baseFilename, settings.SLOW_QUERY_LOG)
@@ -0,0 +1,39 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_name_is_content_hash(self):
+        digest = hashlib.sha256(b'meme').hexdigest()
+        name = self.storage.save('posts/Meme.JPG', ContentFile(b'meme'))
+        self.assertEqual(name, f'posts/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'meme')
+
+    def test_same_content_stored_once(self):
+        """Повторная загрузка того же содержимого не создает файлов."""
+        first = self.storage.save('posts/a.gif', ContentFile(b'meme'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'meme'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            name
+            for _, _, names in os.walk(self.directory)
+            for name in names
+        ]
+        self.assertEqual(len(files), 2)
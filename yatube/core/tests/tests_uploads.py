@@ -0,0 +1,71 @@
+import hashlib
+import io
+
+from django import forms
+from django.core.files.uploadhandler import SkipFile, StopFutureHandlers
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image
+
+from core.uploads import (ImageUploadHandler, UploadedImageField,
+                          uploaded_files)
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('L', (width, height)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(UPLOAD_IMAGE_MAX_BYTES=64 * 1024,
+                   UPLOAD_IMAGE_MAX_PIXELS=1000 * 1000)
+class ImageUploadHandlerTests(SimpleTestCase):
+    def new_file(self, content):
+        """Обработчик, начавший файл; другим обработчикам файл не идет."""
+        handler = ImageUploadHandler(RequestFactory().post('/'))
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file(
+                'image', 'image.png', 'image/png', len(content)
+            )
+        return handler
+
+    def upload(self, content, chunk_size=1024):
+        """
+        (обработчик, файл) или (обработчик, None), если загрузку
+        остановили; отказ тогда — в uploaded_files(request).
+        """
+        handler = self.new_file(content)
+        try:
+            for start in range(0, len(content), chunk_size):
+                handler.receive_data_chunk(
+                    content[start:start + chunk_size], start
+                )
+        except SkipFile:
+            return handler, None
+        return handler, handler.file_complete(len(content))
+
+    def test_hash_computed_while_receiving(self):
+        content = png(100, 100)
+        _, file = self.upload(content)
+        self.assertEqual(file.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file.read(), content)
+        file.close()
+
+    def test_too_many_bytes_rejected(self):
+        """Файл перестает записываться на лимите."""
+        handler, file = self.upload(b'\x00' * 100 * 1024)
+        self.assertIsNone(file)
+        self.assertTrue(handler.file.closed)
+        self.assertEqual(handler.received, 65 * 1024)
+        file = uploaded_files(handler.request)['image']
+        self.assertIn('Файл больше', file.rejected)
+        with self.assertRaises(forms.ValidationError):
+            UploadedImageField().clean(file)
+
+    def test_too_many_pixels_rejected_by_header(self):
+        """Размеры картинки проверяются по первому куску, до конца загрузки."""
+        content = png(2000, 2000)
+        handler = self.new_file(content)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(content[:1024], 0)
+        self.assertIn('мегапикселей', handler.rejected)
+        self.assertTrue(handler.file.closed)
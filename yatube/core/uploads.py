@@ -0,0 +1,159 @@
+"""
+Потоковый прием загружаемых картинок.
+
+Файл пишется на диск кусками и по дороге хешируется (sha256 потом
+берет хранилище по содержимому), а размеры картинки читаются из
+заголовка, как только он пришел. Если файл больше
+UPLOAD_IMAGE_MAX_BYTES или картинка больше UPLOAD_IMAGE_MAX_PIXELS,
+остаток файла пропускается, не записываясь (SkipFile: поля формы
+после файла разбираются как обычно), а форма получает вместо файла
+RejectedUpload с причиной отказа — из uploaded_files(request).
+Обработчик включается только в представлениях с декоратором
+image_uploads; остальные, и админка тоже, принимают файлы
+обработчиками Django по умолчанию.
+"""
+import hashlib
+import io
+import warnings
+from functools import wraps
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import (FileUploadHandler, SkipFile,
+                                             StopFutureHandlers)
+from django.template.defaultfilters import filesizeformat
+from django.utils.datastructures import MultiValueDict
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+# Сколько байт начала файла держать в памяти в поисках заголовка.
+HEADER_LIMIT = 512 * 1024
+
+
+class RejectedUpload(UploadedFile):
+    """Загрузка, остановленная на лимите; rejected — причина."""
+
+    def __init__(self, name, content_type, size, rejected):
+        super().__init__(io.BytesIO(), name, content_type, size)
+        self.rejected = rejected
+
+
+def image_size(header):
+    """Размеры картинки по началу файла или None, если заголовка еще нет."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+        except Image.DecompressionBombError:
+            # Больше двух MAX_IMAGE_PIXELS Pillow не открывает вовсе.
+            return Image.MAX_IMAGE_PIXELS * 2 + 1, 1
+        except (OSError, SyntaxError, ValueError):
+            return None
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Пишет файл на диск, считает sha256 и следит за лимитами."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra,
+        )
+        self.sha256 = hashlib.sha256()
+        self.header = b''
+        self.probing = True
+        self.rejected = None
+        self.received = 0
+        # Файл принимает только этот обработчик.
+        raise StopFutureHandlers
+
+    def reject(self, reason):
+        """Запоминает отказ в request.rejected_uploads и пропускает файл."""
+        self.rejected = reason
+        self.file.close()
+        self.header = b''
+        if not hasattr(self.request, 'rejected_uploads'):
+            self.request.rejected_uploads = MultiValueDict()
+        self.request.rejected_uploads.appendlist(
+            self.field_name,
+            RejectedUpload(
+                self.file_name, self.content_type, self.received, reason
+            ),
+        )
+        raise SkipFile
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_IMAGE_MAX_BYTES:
+            self.reject('Файл больше %s.' % filesizeformat(
+                settings.UPLOAD_IMAGE_MAX_BYTES
+            ))
+        if self.probing:
+            self.check_header(raw_data)
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def check_header(self, raw_data):
+        self.header += raw_data
+        size = image_size(self.header)
+        if size is None and len(self.header) < HEADER_LIMIT:
+            return
+        # Заголовок прочитан или не найден: тогда файл проверит форма.
+        self.probing = False
+        self.header = b''
+        if size is None:
+            return
+        width, height = size
+        if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+            self.reject(
+                'Картинка больше %d мегапикселей.'
+                % (settings.UPLOAD_IMAGE_MAX_PIXELS // 1000000)
+            )
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.sha256.hexdigest()
+        return self.file
+
+
+def image_uploads(view):
+    """
+    Загрузки представления принимает ImageUploadHandler. Обработчик
+    надо поставить до разбора тела, а request.POST читает уже
+    CsrfViewMiddleware, поэтому CSRF проверяется внутри декоратора.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def uploaded_files(request):
+    """request.FILES вместе с загрузками, остановленными на лимите."""
+    files = request.FILES
+    rejected = getattr(request, 'rejected_uploads', None)
+    if not rejected:
+        return files
+    files = files.copy()
+    files.update(rejected)
+    return files
+
+
+class UploadedImageField(forms.ImageField):
+    """ImageField, показывающий причину отказа ImageUploadHandler."""
+
+    def to_python(self, data):
+        rejected = getattr(data, 'rejected', None)
+        if rejected:
+            raise forms.ValidationError(rejected, code='upload_limit')
+        return super().to_python(data)
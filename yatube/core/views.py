@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import REGISTRY
 
 
 def page_not_found(request, exception):
@@ -17,3 +22,20 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    """
+    Метрики всех процессов для Prometheus. Доступны с INTERNAL_IPS
+    или с заголовком Authorization: Bearer METRICS_TOKEN.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (
+        (token and constant_time_compare(authorization, f'Bearer {token}'))
+        or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        REGISTRY.render(), content_type='text/plain; version=0.0.4'
+    )
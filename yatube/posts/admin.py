@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post
 
 
@@ -16,6 +17,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        if not search.match_expression(search_term):
+            return queryset, False
+        return queryset.filter(pk__in=search.post_ids(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
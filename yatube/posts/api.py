@@ -0,0 +1,313 @@
+"""
+JSON-лента только для чтения: посты, посты группы и автора,
+комментарии поста и лента подписок.
+
+Страницы листаются по ключу, как и HTML-ленты: ?cursor= из поля
+next предыдущего ответа, ?limit= — размер страницы (до MAX_LIMIT).
+?fields=id,text,... выбирает поля ответа, и из базы читаются только
+нужные для них колонки (.only()) и связи (select_related).
+
+Ответ пишется по мере чтения строк из базы: по CHUNK_SIZE объектов,
+миниатюры которых находятся одним запросом к кешу.
+
+.../new/?since=<id> отвечает, сколько постов новее since
+(см. high_water).
+"""
+import json
+from collections import namedtuple
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from . import high_water, thumbnails
+from .models import Comment, Group, Post
+from .timeline import TimelinePaginator
+from .utils import (COMMENT_ORDERING, FEED_ORDERING, NEXT, decode_cursor,
+                    encode_cursor, seek)
+
+User = get_user_model()
+
+MAX_LIMIT = 100
+CHUNK_SIZE = 50
+THUMBNAIL = 'x750'
+
+# columns — колонки для .only(), related — связь для select_related.
+Field = namedtuple('Field', 'columns related value')
+
+
+def image_value(obj):
+    image = obj.prefetched_thumbnails.get(THUMBNAIL) if obj.image else None
+    if image is None:
+        return None
+    return {
+        'src': image.src.url,
+        'width': image.width,
+        'height': image.height,
+        'srcset': image.srcset,
+        'sources': image.sources,
+    }
+
+
+POST_FIELDS = {
+    'id': Field(('id',), None, attrgetter('id')),
+    'text': Field(('text',), None, attrgetter('text')),
+    'pub_date': Field(('pub_date',), None, attrgetter('pub_date')),
+    'author': Field(
+        ('author__username',), 'author', attrgetter('author.username')
+    ),
+    'group': Field(
+        ('group__slug',),
+        'group',
+        lambda post: post.group.slug if post.group_id else None,
+    ),
+    'comments_count': Field(
+        ('comments_count',), None, attrgetter('comments_count')
+    ),
+    'image': Field(('image',), None, image_value),
+}
+
+COMMENT_FIELDS = {
+    'id': Field(('id',), None, attrgetter('id')),
+    'text': Field(('text',), None, attrgetter('text')),
+    'created': Field(('created',), None, attrgetter('created')),
+    'author': Field(
+        ('author__username',), 'author', attrgetter('author.username')
+    ),
+    'image': Field(('image',), None, image_value),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def selected_fields(request, available):
+    """Поля из ?fields= (по умолчанию все) в порядке available."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    wanted = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = wanted - available.keys()
+    if unknown:
+        raise BadRequest(
+            'Неизвестные поля: {}. Доступны: {}'.format(
+                ', '.join(sorted(unknown)), ', '.join(available)
+            )
+        )
+    return [name for name in available if name in wanted]
+
+
+def columns(fields, available, ordering):
+    """(колонки для .only(), связи для select_related) полей fields."""
+    only = [field.lstrip('-') for field in ordering]
+    related = []
+    for name in fields:
+        field = available[name]
+        only.extend(field.columns)
+        if field.related:
+            related.append(field.related)
+    return only, related
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def page_cursor(request, model, ordering):
+    """Ключ, после которого продолжается лента, или None с начала."""
+    cursor = request.GET.get('cursor')
+    if not cursor:
+        return None
+    direction, values = decode_cursor(cursor, model, ordering)
+    if direction != NEXT:
+        raise BadRequest('Неверный курсор')
+    return values
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream(rows, fields, available, limit, key):
+    """
+    Тело ответа по частям: {"results": [...], "next": курсор}.
+    rows — до limit + 1 объектов; лишний означает, что есть
+    следующая страница.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    values = [(name, available[name].value) for name in fields]
+    yield '{"results": ['
+    written = 0
+    last = None
+    more = False
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        if 'image' in fields:
+            thumbnails.prefetch(chunk, THUMBNAIL)
+        for obj in chunk:
+            if written == limit:
+                more = True
+                break
+            row = {name: value(obj) for name, value in values}
+            yield (',' if written else '') + encoder.encode(row)
+            written += 1
+            last = obj
+    cursor = encode_cursor(NEXT, key(last)) if more else None
+    yield '], "next": ' + json.dumps(cursor) + '}'
+
+
+def json_feed(request, queryset, available=POST_FIELDS,
+              ordering=FEED_ORDERING):
+    """Страница queryset в порядке ordering потоком JSON."""
+    try:
+        fields = selected_fields(request, available)
+        limit = page_limit(request)
+        values = page_cursor(request, queryset.model, ordering)
+    except BadRequest as error:
+        return _error(str(error))
+    only, related = columns(fields, available, ordering)
+    rows = seek(
+        queryset.select_related(*related).only(*only), ordering, values
+    )[:limit + 1].iterator(chunk_size=CHUNK_SIZE)
+
+    def key(obj):
+        return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+    return StreamingHttpResponse(
+        stream(rows, fields, available, limit, key),
+        content_type='application/json',
+    )
+
+
+@require_GET
+def posts(request):
+    return json_feed(request, Post.objects.all())
+
+
+@require_GET
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        return _error('Группа не найдена', 404)
+    return json_feed(request, Post.objects.filter(group_id=group_id))
+
+
+@require_GET
+def author_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        return _error('Автор не найден', 404)
+    return json_feed(request, Post.objects.filter(author_id=author_id))
+
+
+@require_GET
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', 404)
+    return json_feed(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        COMMENT_ORDERING,
+    )
+
+
+@require_GET
+def follow_posts(request):
+    """Лента подписок: материализованная лента и авторы без fan-out."""
+    if not request.user.is_authenticated:
+        return _error('Нужно войти', 401)
+    try:
+        fields = selected_fields(request, POST_FIELDS)
+        limit = page_limit(request)
+        values = page_cursor(request, Post, FEED_ORDERING)
+    except BadRequest as error:
+        return _error(str(error))
+    only, related = columns(fields, POST_FIELDS, FEED_ORDERING)
+    paginator = TimelinePaginator(request.user, limit, related, only)
+    rows = paginator.fetch(NEXT, values, limit + 1)
+    return StreamingHttpResponse(
+        stream(rows, fields, POST_FIELDS, limit, paginator.key),
+        content_type='application/json',
+    )
+
+
+def _since(request):
+    try:
+        return int(request.GET['since'])
+    except (KeyError, ValueError):
+        raise BadRequest('since должен быть id поста')
+
+
+def _new_posts(count, latest=None):
+    cap = settings.NEW_POSTS_CAP
+    data = {'count': min(count, cap), 'more': count > cap}
+    if latest is not None:
+        data['latest'] = latest
+    return JsonResponse(data)
+
+
+@require_GET
+def new_posts(request):
+    """Сколько постов в общей ленте новее ?since=."""
+    try:
+        since = _since(request)
+    except BadRequest as error:
+        return _error(str(error))
+    return _new_posts(*high_water.feed_new_posts(since))
+
+
+@require_GET
+def group_new_posts(request, slug):
+    try:
+        since = _since(request)
+    except BadRequest as error:
+        return _error(str(error))
+    result = high_water.group_new_posts(slug, since)
+    if result is None:
+        return _error('Группа не найдена', 404)
+    return _new_posts(*result)
+
+
+@require_GET
+def author_new_posts(request, username):
+    try:
+        since = _since(request)
+    except BadRequest as error:
+        return _error(str(error))
+    result = high_water.author_new_posts(username, since)
+    if result is None:
+        return _error('Автор не найден', 404)
+    return _new_posts(*result)
+
+
+@require_GET
+def follow_new_posts(request):
+    if not request.user.is_authenticated:
+        return _error('Нужно войти', 401)
+    try:
+        since = _since(request)
+    except BadRequest as error:
+        return _error(str(error))
+    return _new_posts(high_water.follow_new_posts(request.user, since))
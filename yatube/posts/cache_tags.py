@@ -0,0 +1,16 @@
+"""Теги кеша, от которых зависят страницы постов."""
+FEED = 'feed'
+
+
+def group_tag(group_id):
+    # По id, а не slug: slug бывает не ASCII и с пробелами (ключи
+    # memcached) и меняется при переименовании.
+    return f'group:{group_id}'
+
+
+def author_tag(author_id):
+    return f'author:{author_id}'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
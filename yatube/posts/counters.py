@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _deltas(deltas):
+    """
+    Выражения для update(). Уменьшение не опускает счетчик ниже нуля:
+    если он уже разошелся с таблицами (до recount_counters), запись
+    в PositiveIntegerField иначе падает с IntegrityError.
+    """
+    return {
+        field: Greatest(F(field) + delta, 0) if delta < 0
+        else F(field) + delta
+        for field, delta in deltas.items() if delta
+    }
+
+
+def bump_user(user_id, **deltas):
+    """Атомарно меняет счетчики пользователя на deltas."""
+    updates = _deltas(deltas)
+    if not updates:
+        return
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if any(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(**_deltas(
+            {'posts_count': delta}
+        ))
+
+
+def bump_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(**_deltas(
+        {'comments_count': delta}
+    ))
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')[:1],
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount():
+    """Пересчитывает все счетчики по исходным таблицам."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        'users': UserStats.objects.update(
+            posts_count=count_of(Post, 'author'),
+            followers_count=count_of(Follow, 'author'),
+            following_count=count_of(Follow, 'user'),
+        ),
+        'groups': Group.objects.update(posts_count=count_of(Post, 'group')),
+        'posts': Post.objects.update(
+            comments_count=count_of(Comment, 'post')
+        ),
+    }
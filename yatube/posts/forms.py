@@ -1,5 +1,7 @@
 from django import forms
 
+from core.uploads import UploadedImageField
+
 from .models import Comment, Post
 
 
@@ -13,6 +15,7 @@ class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
+        field_classes = {'image': UploadedImageField}
         fields = ('text', 'group', 'image',)
         labels = {
             'text': 'Пост:',
@@ -34,6 +37,7 @@ class CommentForm(forms.ModelForm):
 
     class Meta:
         model = Comment
+        field_classes = {'image': UploadedImageField}
         fields = ('text', 'image',)
         labels = {
             'text': 'Комментарий:',
@@ -0,0 +1,168 @@
+"""
+Отметки последнего поста для опроса «есть ли новые посты».
+
+Для общей ленты, каждой группы и каждого автора в кеше хранится id
+их последнего поста (по id группы и автора); post_saved поднимает
+отметки при публикации и при переносе поста в группу.
+Если отметка не выше since клиента, новых постов нет и база не нужна —
+это самый частый ответ. Иначе новые посты считаются по индексу,
+но не больше NEW_POSTS_CAP: клиенту достаточно «99+».
+
+Отметка поднимается после коммита, когда пост уже виден всем,
+и только вверх: incr в кеше атомарен, а гонка двух публикаций может
+лишь завысить отметку — тогда ответ просто посчитается по базе.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Group, Post, TimelineEntry
+from .timeline import pulled_author_ids
+
+User = get_user_model()
+
+FEED_MARK = 'new_posts:feed'
+GROUP_MARK = 'new_posts:group:%d'
+AUTHOR_MARK = 'new_posts:author:%d'
+# id группы и автора по slug и username из адреса опроса: отметки
+# ключуются по id, которые не меняются при переименовании.
+GROUP_ID = 'new_posts:group_id:%s'
+AUTHOR_ID = 'new_posts:author_id:%s'
+
+
+def _name_key(template, name):
+    return template % hashlib.md5(name.encode()).hexdigest()
+
+
+def _entity_id(template, queryset, name):
+    """id объекта по имени: из кеша, иначе одним запросом к базе."""
+    key = _name_key(template, name)
+    entity_id = cache.get(key)
+    if entity_id is None:
+        entity_id = queryset.values_list('pk', flat=True).first()
+        if entity_id is not None:
+            cache.set(key, entity_id, None)
+    return entity_id
+
+
+def forget_group(slug):
+    """Сбрасывает id группы по slug (после сохранения или удаления)."""
+    cache.delete(_name_key(GROUP_ID, slug))
+
+
+def forget_author(username):
+    cache.delete(_name_key(AUTHOR_ID, username))
+
+
+def mark_keys(post):
+    """Ключи отметок лент поста; id автора и группы есть в самом посте."""
+    keys = [FEED_MARK, AUTHOR_MARK % post.author_id]
+    if post.group_id is not None:
+        keys.append(GROUP_MARK % post.group_id)
+    return keys
+
+
+def raise_mark(key, post_id):
+    """Поднимает отметку key до post_id; вниз она не опускается."""
+    while True:
+        current = cache.get(key)
+        if current is None:
+            if cache.add(key, post_id, None):
+                return
+            continue
+        if current >= post_id:
+            return
+        try:
+            cache.incr(key, post_id - current)
+            return
+        except ValueError:
+            # Отметку вытеснили между чтением и incr.
+            continue
+
+
+def bump(post, keys=None):
+    """
+    Поднимает отметки лент поста после коммита: по умолчанию все
+    (новый пост), иначе только keys (пост перенесли в группу).
+    """
+    if keys is None:
+        keys = mark_keys(post)
+    post_id = post.pk
+
+    def raise_marks():
+        for key in keys:
+            raise_mark(key, post_id)
+
+    transaction.on_commit(raise_marks)
+
+
+def mark(key, posts):
+    """Отметка из кеша; после вытеснения — заново по posts."""
+    value = cache.get(key)
+    if value is None:
+        value = posts.aggregate(latest=Max('pk'))['latest'] or 0
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+    return value
+
+
+def bounded_count(queryset):
+    """Число строк queryset, но не больше NEW_POSTS_CAP + 1."""
+    return queryset.order_by()[:settings.NEW_POSTS_CAP + 1].count()
+
+
+def new_posts(key, posts, since):
+    """(число новых постов новее since, отметка ленты)."""
+    latest = mark(key, posts)
+    if latest <= since:
+        return 0, latest
+    return bounded_count(posts.filter(pk__gt=since)), latest
+
+
+def feed_new_posts(since):
+    return new_posts(FEED_MARK, Post.objects.all(), since)
+
+
+def group_new_posts(slug, since):
+    """None, если группы нет."""
+    group_id = _entity_id(GROUP_ID, Group.objects.filter(slug=slug), slug)
+    if group_id is None:
+        return None
+    return new_posts(
+        GROUP_MARK % group_id, Post.objects.filter(group_id=group_id), since
+    )
+
+
+def author_new_posts(username, since):
+    """None, если автора нет."""
+    author_id = _entity_id(
+        AUTHOR_ID, User.objects.filter(username=username), username
+    )
+    if author_id is None:
+        return None
+    return new_posts(
+        AUTHOR_MARK % author_id,
+        Post.objects.filter(author_id=author_id),
+        since,
+    )
+
+
+def follow_new_posts(user, since):
+    """
+    Лента подписок у каждого своя, поэтому без отметки: считаются
+    записи материализованной ленты (по уникальному индексу user, post)
+    и посты авторов без fan-out.
+    """
+    count = bounded_count(
+        TimelineEntry.objects.filter(user=user, post_id__gt=since)
+    )
+    pulled = pulled_author_ids(user)
+    if pulled and count <= settings.NEW_POSTS_CAP:
+        count += bounded_count(
+            Post.objects.filter(author_id__in=pulled, pk__gt=since)
+        )
+    return count
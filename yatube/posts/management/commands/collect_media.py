@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки, на которые не ссылается ни один пост.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=60 * 60,
+            help='Сколько секунд файл должен пробыть без ссылок.',
+        )
+
+    def handle(self, *args, **options):
+        removed = media.collect(timedelta(seconds=options['grace']))
+        self.stdout.write(f'Удалено файлов: {removed}')
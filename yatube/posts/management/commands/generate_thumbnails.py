@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для уже загруженных картинок.'
+
+    def handle(self, *args, **options):
+        generated = 0
+        for model in (Post, Comment):
+            for instance in model.objects.exclude(image='').only(
+                'image'
+            ).iterator():
+                for variant in thumbnails.variants_for(instance):
+                    thumbnails.generate(instance.image.name, *variant)
+                    generated += 1
+        self.stdout.write(f'Построено миниатюр: {generated}')
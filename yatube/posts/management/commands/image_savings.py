@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Comment, Post
+
+
+def percent(part, whole):
+    return f'{100 * part / whole:.1f}%' if whole else '—'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объем исходных картинок с объемом их миниатюр '
+        'по размерам и форматам.'
+    )
+
+    def handle(self, *args, **options):
+        originals = {}
+        variants = defaultdict(dict)
+        for model in (Post, Comment):
+            for instance in model.objects.exclude(image='').only(
+                'image'
+            ).iterator():
+                image = instance.image
+                if image.name in originals or not image.storage.exists(
+                    image.name
+                ):
+                    continue
+                originals[image.name] = image.size
+                for geometry, image_format in thumbnails.variants_for(
+                    instance
+                ):
+                    file = thumbnails.thumbnail_file(
+                        image, geometry, image_format
+                    )
+                    if file.exists():
+                        variants[(geometry, image_format or 'JPEG')][
+                            image.name
+                        ] = file.storage.size(file.name)
+        total = sum(originals.values())
+        self.stdout.write(
+            f'Исходные картинки: {len(originals)}, {total} байт'
+        )
+        for (geometry, image_format), sizes in sorted(variants.items()):
+            size = sum(sizes.values())
+            original = sum(originals[name] for name in sizes)
+            line = (
+                f'{geometry} {image_format}: {len(sizes)} шт., {size} байт, '
+                f'{percent(size, original)} от исходных'
+            )
+            baseline = variants.get((geometry, 'JPEG'))
+            if image_format != 'JPEG' and baseline:
+                jpeg = sum(baseline.get(name, 0) for name in sizes)
+                line += f', {percent(size, jpeg)} от JPEG'
+            self.stdout.write(line)
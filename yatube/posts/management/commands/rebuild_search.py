@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает индекс полнотекстового поиска пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей индексировать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(options['batch_size'])
+        for name, total in indexed.items():
+            self.stdout.write(f'{name}: {total}')
@@ -0,0 +1,66 @@
+"""
+Счетчики ссылок на картинки в хранилище по содержимому.
+
+Картинку могут делить многие посты и комментарии, поэтому файл
+удаляется не вместе с записью, а сборщиком (collect), когда ссылок
+не осталось дольше grace: за это время та же картинка может быть
+загружена снова и опять получить ссылку.
+"""
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from .models import MediaFile
+from .thumbnails import source
+
+
+def retain(name):
+    """Добавляет ссылку на файл."""
+    if not name:
+        return
+    updates = {'references': F('references') + 1, 'updated': timezone.now()}
+    if MediaFile.objects.filter(name=name).update(**updates):
+        return
+    MediaFile.objects.bulk_create([MediaFile(name=name)], ignore_conflicts=True)
+    MediaFile.objects.filter(name=name).update(**updates)
+
+
+def release(name):
+    """Убирает ссылку на файл."""
+    if name:
+        MediaFile.objects.filter(name=name, references__gt=0).update(
+            references=F('references') - 1, updated=timezone.now()
+        )
+
+
+def replace(old_name, new_name):
+    if old_name != new_name:
+        retain(new_name)
+        release(old_name)
+
+
+def collect(grace):
+    """
+    Удаляет файлы без ссылок вместе с миниатюрами и возвращает
+    их число. Файл, который за grace загрузили снова, остается.
+    """
+    deadline = timezone.now() - grace
+    removed = 0
+    names = MediaFile.objects.filter(
+        references=0, updated__lt=deadline
+    ).values_list('name', flat=True)
+    for name in list(names):
+        exists = default_storage.exists(name)
+        if exists and default_storage.get_modified_time(name) > deadline:
+            continue
+        with transaction.atomic():
+            if not MediaFile.objects.filter(
+                name=name, references=0, updated__lt=deadline
+            ).delete()[0]:
+                continue
+            if exists:
+                delete(source(name))
+        removed += 1
+    return removed
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:24
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def fill_references(apps, schema_editor):
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    references = Counter()
+    for model_name in ('Post', 'Comment'):
+        model = apps.get_model('posts', model_name)
+        references.update(
+            model.objects.exclude(image='').values_list('image', flat=True)
+        )
+    MediaFile.objects.bulk_create(
+        [
+            MediaFile(name=name, references=total)
+            for name, total in references.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Изменен')),
+            ],
+            options={
+                'verbose_name_plural': 'Загруженные файлы',
+            },
+        ),
+        migrations.RunPython(fill_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.19 on 2026-10-18 18:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_mediafile'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                "CREATE VIRTUAL TABLE posts_search USING fts5("
+                "text, post_id UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')",
+                'INSERT INTO posts_search (rowid, text, post_id) '
+                'SELECT 2 * id, text, id FROM posts_post',
+                'INSERT INTO posts_search (rowid, text, post_id) '
+                'SELECT 2 * id + 1, text, post_id FROM posts_comment',
+            ],
+            'DROP TABLE posts_search',
+        ),
+    ]
@@ -4,11 +4,25 @@ from django.db import models
 User = get_user_model()
 
 
+class LoadedValuesMixin:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженные значения, чтобы видеть их изменения."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
 class Group(models.Model):
     """Задает название, описание группы, ссылку в адресной строке"""
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField(unique=True, verbose_name='Адрес')
     description = models.TextField(verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество постов',
+    )
 
     class Meta:
         verbose_name_plural = 'Группы'
@@ -18,7 +32,7 @@ class Group(models.Model):
         return f' {self.title}'
 
 
-class Post(models.Model):
+class Post(LoadedValuesMixin, models.Model):
     """Задает текст поста, дату публикации, автора и группу"""
     text = models.TextField(
         verbose_name='Содержание записи',
@@ -46,17 +60,37 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
+    )
 
     class Meta:
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
-        ordering = ['-pub_date']
+        # Совпадает с FEED_ORDERING и индексами ниже: ленты читаются
+        # по индексу, без сортировки во временном B-дереве.
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Comment(models.Model):
+class Comment(LoadedValuesMixin, models.Model):
     """
     Ссылка на пост и автора комментария,
     текст комментария, дата и время комментария.
@@ -91,8 +125,14 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
         verbose_name_plural = 'Комментарии к постам'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -115,6 +155,119 @@ class Follow(models.Model):
 
     class Meta:
         verbose_name_plural = 'Подписки на авторов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='follow_unique_user_author'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
+
+
+class UserStats(models.Model):
+    """Счетчики постов, подписчиков и подписок пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок',
+    )
+
+    class Meta:
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """
+    Пост в материализованной ленте подписок пользователя.
+    Заполняется при публикации поста (fan-out on write),
+    поэтому лента читается одним диапазоном по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_unique_user_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class MediaFile(models.Model):
+    """
+    Загруженный файл и число постов и комментариев, которые на него
+    ссылаются. Файлы хранятся по содержимому, поэтому одну картинку
+    могут делить многие записи; без ссылок файл удаляет collect_media.
+    """
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name='Файл',
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество ссылок',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменен',
+    )
+
+    class Meta:
+        verbose_name_plural = 'Загруженные файлы'
+
+    def __str__(self):
+        return self.name
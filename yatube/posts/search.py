@@ -0,0 +1,191 @@
+"""
+Полнотекстовый поиск по постам и комментариям (SQLite FTS5).
+
+Тексты лежат в виртуальной таблице posts_search и обновляются
+сигналами при сохранении и удалении. rowid записи кодирует ее
+источник: пост id — 2 * id, комментарий id — 2 * id + 1, поэтому
+запись обновляется и удаляется по первичному ключу, без сканирования.
+
+Результат поиска — посты, упорядоченные по bm25: пост находится
+и по своему тексту, и по тексту комментариев, но совпадение
+в самом посте весит больше.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+from .utils import PREVIOUS, CursorPaginator
+
+TABLE = 'posts_search'
+# Во сколько раз совпадение в комментарии весит меньше, чем в посте.
+COMMENT_WEIGHT = 0.5
+
+# bm25 нельзя считать внутри агрегата, поэтому совпадения считаются
+# в подзапросе и группируются по посту снаружи. LIMIT -1 не дает SQLite
+# встроить подзапрос в агрегат (AS MATERIALIZED требует SQLite 3.35),
+# и совпадения идут в GROUP BY потоком, без временной таблицы.
+SEARCH = f'''
+    WITH hits AS (
+        SELECT post_id, bm25({TABLE}) * (
+            CASE rowid %% 2 WHEN 0 THEN 1.0 ELSE {COMMENT_WEIGHT} END
+        ) AS score
+        FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT -1
+    ),
+    ranked AS (
+        SELECT post_id, MIN(score) AS score FROM hits GROUP BY post_id
+    )
+    SELECT post_id, score FROM ranked
+'''
+
+
+def post_rowid(post_id):
+    return 2 * post_id
+
+
+def comment_rowid(comment_id):
+    return 2 * comment_id + 1
+
+
+def match_expression(query):
+    """
+    Запрос пользователя в синтаксисе MATCH: все слова обязательны,
+    последнее ищется как префикс. Операторы FTS5 из запроса
+    не пропускаются. Пустая строка — искать нечего.
+    """
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _replace(rows):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text, post_id) '
+            'VALUES (%s, %s, %s)',
+            rows,
+        )
+
+
+def _delete(rowid):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+
+
+def index_post(post):
+    _replace([(post_rowid(post.pk), post.text, post.pk)])
+
+
+def index_comment(comment):
+    _replace([(comment_rowid(comment.pk), comment.text, comment.post_id)])
+
+
+def remove_post(post):
+    _delete(post_rowid(post.pk))
+
+
+def remove_comment(comment):
+    _delete(comment_rowid(comment.pk))
+
+
+def post_ids(query):
+    """
+    id постов, в тексте которых есть query, — подзапрос для
+    .filter(pk__in=...) вместо LIKE '%query%'.
+    """
+    return RawSQL(
+        f'SELECT rowid / 2 FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND rowid %% 2 = 0',
+        [match_expression(query)],
+    )
+
+
+def rebuild(batch_size=1000):
+    """
+    Переиндексирует все посты и комментарии пачками по batch_size строк,
+    каждая пачка — отдельная транзакция, и удаляет записи об удаленных.
+    Поиск во время перестройки продолжает работать.
+    """
+    totals = {}
+    for name, model, rowid, parity in (
+        ('posts', Post, post_rowid, 0),
+        ('comments', Comment, comment_rowid, 1),
+    ):
+        post_field = 'id' if model is Post else 'post_id'
+        last = 0
+        total = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last).order_by('pk').values_list(
+                    'pk', 'text', post_field
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                _replace([(rowid(pk), text, post) for pk, text, post in batch])
+            last = batch[-1][0]
+            total += len(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid %% 2 = %s AND rowid / 2 '
+                f'NOT IN (SELECT id FROM {model._meta.db_table})',
+                [parity],
+            )
+        totals[name] = total
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return totals
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Страницы результатов по ключу (score, post_id): ранжирование
+    считается в SQLite, а в курсоре запоминается последний показанный
+    результат, поэтому OFFSET не нужен.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'),
+            per_page,
+            ordering=('search_score', 'pk'),
+        )
+        self.match = match_expression(query)
+
+    def key(self, obj):
+        return [obj.search_score, obj.pk]
+
+    def converters(self):
+        return [float, int]
+
+    def fetch(self, direction, values, limit):
+        if not self.match:
+            return []
+        compare, order = ('<', 'DESC') if direction == PREVIOUS else (
+            '>', 'ASC'
+        )
+        sql = SEARCH
+        params = [self.match]
+        if values is not None:
+            sql += (
+                f' WHERE score {compare} %s '
+                f'OR (score = %s AND post_id {compare} %s)'
+            )
+            params += [values[0], values[0], values[1]]
+        sql += f' ORDER BY score {order}, post_id {order} LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            scores = cursor.fetchall()
+        posts = self.object_list.in_bulk([pk for pk, _ in scores])
+        result = []
+        for pk, score in scores:
+            post = posts.get(pk)
+            if post is not None:
+                post.search_score = score
+                result.append(post)
+        return result
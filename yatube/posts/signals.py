@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_tags
+
+from . import counters, high_water, media, search, thumbnails, timeline
+from .cache_tags import FEED, author_tag, group_tag, post_tag
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def invalidate_post(post, *group_ids):
+    group_ids = group_ids or (post.group_id,)
+    invalidate_tags(
+        FEED,
+        author_tag(post.author_id),
+        post_tag(post.pk),
+        *(group_tag(pk) for pk in set(group_ids) if pk is not None),
+    )
+
+
+def save_image(instance, created):
+    """Ссылка на новую картинку и ее миниатюры после сохранения записи."""
+    loaded = getattr(instance, '_loaded_values', {})
+    name = instance.image.name
+    if created or ('image' in loaded and loaded['image'] != name):
+        media.replace(loaded.get('image'), name)
+        make_thumbnails(instance)
+    instance._loaded_values = {**loaded, 'image': name}
+
+
+def text_changed(instance, created):
+    """Изменился ли текст записи с загрузки (для индекса поиска)."""
+    loaded = getattr(instance, '_loaded_values', {})
+    changed = created or loaded.get('text') != instance.text
+    instance._loaded_values = {**loaded, 'text': instance.text}
+    return changed
+
+
+def make_thumbnails(instance):
+    """Миниатюры новой картинки строятся после коммита, в фоне."""
+    if instance.image:
+        name = instance.image.name
+        tasks = thumbnails.variants_for(instance)
+        transaction.on_commit(lambda: thumbnails.schedule(name, tasks))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_username(sender, instance, **kwargs):
+    """Имя могло достаться другому пользователю: id берется заново."""
+    high_water.forget_author(instance.username)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        counters.bump_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+        high_water.bump(instance)
+    elif 'group_id' in loaded and loaded['group_id'] != instance.group_id:
+        counters.bump_group(loaded['group_id'], -1)
+        counters.bump_group(instance.group_id, 1)
+        if instance.group_id is not None:
+            high_water.bump(
+                instance, [high_water.GROUP_MARK % instance.group_id]
+            )
+    save_image(instance, created)
+    if text_changed(instance, created):
+        search.index_post(instance)
+    invalidate_post(instance, loaded.get('group_id'), instance.group_id)
+    instance._loaded_values['group_id'] = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    counters.bump_group(instance.group_id, -1)
+    media.release(instance.image.name)
+    search.remove_post(instance)
+    invalidate_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_post(instance.post_id, 1)
+    save_image(instance, created)
+    if text_changed(instance, created):
+        search.index_comment(instance)
+    invalidate_tags(post_tag(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    media.release(instance.image.name)
+    search.remove_comment(instance)
+    invalidate_tags(post_tag(instance.post_id))
+
+
+def invalidate_follow(follow):
+    # Счетчики подписок видны в профилях обоих.
+    invalidate_tags(author_tag(follow.user_id), author_tag(follow.author_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_tags(group_tag(instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_slug(sender, instance, **kwargs):
+    high_water.forget_group(instance.slug)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        invalidate_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.resume_fan_out(instance.author_id)
+    invalidate_follow(instance)
@@ -0,0 +1,23 @@
+from django import template
+
+from posts.thumbnails import prefetch
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 767px) 100vw, 75vw'
+
+
+@register.inclusion_tag('includes/responsive_image.html')
+def responsive_image(obj, geometry, sizes=DEFAULT_SIZES):
+    """
+    Картинка obj.image в <picture> со всеми вариантами миниатюры.
+
+    {% responsive_image post "x750" %}
+
+    Варианты берутся из thumbnails.prefetch, а без него
+    ищутся здесь же для одного объекта.
+    """
+    prefetched = getattr(obj, 'prefetched_thumbnails', {})
+    if geometry not in prefetched:
+        prefetch([obj], geometry)
+    return {'image': obj.prefetched_thumbnails[geometry], 'sizes': sizes}
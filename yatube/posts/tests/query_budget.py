@@ -0,0 +1,42 @@
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Падает, если в блоке (или в декорированном тесте) выполнено
+    больше limit запросов к базе. В отличие от assertNumQueries
+    задает потолок, а не точное число.
+    """
+
+    def __init__(self, limit, using=DEFAULT_DB_ALIAS):
+        self.limit = limit
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.limit:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(
+                    self.context.captured_queries, start=1
+                )
+            )
+            raise QueryBudgetExceeded(
+                f'{executed} запросов при бюджете {self.limit}:\n{queries}'
+            )
+        return False
@@ -0,0 +1,270 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import high_water
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import NEXT, encode_cursor
+
+NUMBER_OF_POSTS = 7
+
+
+class JsonFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Margarita')
+        cls.reader = User.objects.create_user(username='Natasha')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        for number in range(NUMBER_OF_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Ответ {number}'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def walk(self, url, **params):
+        """Все страницы ленты по курсорам next."""
+        rows = []
+        cursor = None
+        while True:
+            if cursor:
+                params['cursor'] = cursor
+            page = self.get(url, **params)
+            rows.extend(page['results'])
+            cursor = page['next']
+            if cursor is None:
+                return rows
+
+    def test_cursor_pagination(self):
+        """Страницы по курсору проходят всю ленту без повторов."""
+        for url in (
+            reverse('posts:api_posts'),
+            reverse('posts:api_group_posts', args=[self.group.slug]),
+            reverse('posts:api_author_posts', args=[self.author.username]),
+        ):
+            with self.subTest(url=url):
+                rows = self.walk(url, limit=3)
+                self.assertEqual(
+                    [row['id'] for row in rows],
+                    list(Post.objects.values_list('id', flat=True)),
+                )
+
+    def test_comments(self):
+        rows = self.walk(
+            reverse('posts:api_post_comments', args=[self.post.pk]), limit=2
+        )
+        self.assertEqual(
+            [row['text'] for row in rows],
+            ['Ответ 2', 'Ответ 1', 'Ответ 0'],
+        )
+        self.assertEqual(rows[0]['author'], 'Natasha')
+
+    def test_follow_feed(self):
+        self.assertEqual(
+            self.client.get(reverse('posts:api_follow_posts')).status_code,
+            401,
+        )
+        self.client.force_login(self.reader)
+        rows = self.walk(
+            reverse('posts:api_follow_posts'), limit=4, fields='id,author'
+        )
+        self.assertEqual(len(rows), NUMBER_OF_POSTS)
+        self.assertEqual(set(rows[0]), {'id', 'author'})
+        self.assertEqual(rows[0]['author'], 'Margarita')
+
+    def test_sparse_fields_select_columns(self):
+        """?fields= ограничивает и поля ответа, и колонки запроса."""
+        url = reverse('posts:api_posts')
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get(url, fields='id,group')
+        self.assertEqual(set(page['results'][0]), {'id', 'group'})
+        self.assertEqual(page['results'][0]['group'], 'api')
+        sql = queries[-1]['sql']
+        self.assertIn('"posts_group"."slug"', sql)
+        self.assertNotIn('"posts_post"."text"', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_bad_requests(self):
+        url = reverse('posts:api_posts')
+        for params in (
+            {'fields': 'id,password'},
+            {'limit': 'много'},
+            {'cursor': 'not-a-cursor'},
+            {'cursor': encode_cursor(NEXT, ['garbage', 'not-an-id'])},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:api_group_posts', args=['missing'])
+            ).status_code,
+            404,
+        )
+
+
+class NewPostsTests(TransactionTestCase):
+    """Отметки поднимаются после коммита, поэтому с настоящими коммитами."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Korovyev')
+        self.reader = User.objects.create_user(username='Varenukha')
+        self.group = Group.objects.create(
+            title='Группа', slug='news', description='Описание'
+        )
+        self.other_group = Group.objects.create(
+            title='Другая', slug='quiet', description='Описание'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(
+            text='Старый пост', author=self.author, group=self.group
+        )
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('posts:api_new_posts'),
+            reverse('posts:api_group_new_posts', args=[self.group.slug]),
+            reverse(
+                'posts:api_author_new_posts', args=[self.author.username]
+            ),
+        )
+
+    def new(self, url, since):
+        response = self.client.get(url, {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_no_news_without_database(self):
+        """Если новых постов нет, отвечает отметка из кеша."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.new(url, self.post.pk)
+                with self.assertNumQueries(0):
+                    data = self.new(url, self.post.pk)
+                self.assertEqual(
+                    data, {'count': 0, 'more': False, 'latest': self.post.pk}
+                )
+
+    def test_counts_new_posts(self):
+        for url in self.urls():
+            self.new(url, self.post.pk)
+        for text in ('Новый', 'Еще'):
+            Post.objects.create(
+                text=text, author=self.author, group=self.group
+            )
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.new(url, self.post.pk)['count'], 2)
+        self.assertEqual(
+            self.new(
+                reverse(
+                    'posts:api_group_new_posts', args=[self.other_group.slug]
+                ),
+                self.post.pk,
+            )['count'],
+            0,
+        )
+
+    def test_mark_raised_after_commit(self):
+        """Пока пост не закоммичен, клиенты не видят его в отметке."""
+        url = reverse('posts:api_new_posts')
+        self.new(url, self.post.pk)
+        with transaction.atomic():
+            post = Post.objects.create(
+                text='В транзакции', author=self.author
+            )
+            self.assertEqual(
+                cache.get(high_water.FEED_MARK), self.post.pk
+            )
+        self.assertEqual(self.new(url, self.post.pk)['latest'], post.pk)
+
+    def test_mark_never_goes_down(self):
+        high_water.raise_mark('new_posts:test', 5)
+        high_water.raise_mark('new_posts:test', 3)
+        self.assertEqual(cache.get('new_posts:test'), 5)
+        high_water.raise_mark('new_posts:test', 8)
+        self.assertEqual(cache.get('new_posts:test'), 8)
+
+    def test_mark_keys_by_id(self):
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            keys = high_water.mark_keys(post)
+        self.assertEqual(keys, [
+            high_water.FEED_MARK,
+            high_water.AUTHOR_MARK % self.author.pk,
+            high_water.GROUP_MARK % self.group.pk,
+        ])
+
+    def test_post_moved_into_group(self):
+        """Перенос поста в группу поднимает отметку группы."""
+        url = reverse(
+            'posts:api_group_new_posts', args=[self.other_group.slug]
+        )
+        self.assertEqual(self.new(url, self.post.pk)['count'], 0)
+        post = Post.objects.create(text='Без группы', author=self.author)
+        post.group = self.other_group
+        post.save()
+        data = self.new(url, self.post.pk)
+        self.assertEqual((data['count'], data['latest']), (1, post.pk))
+
+    def test_slug_taken_by_another_group(self):
+        """Отметка не переходит к группе, занявшей прежний slug."""
+        url = reverse('posts:api_group_new_posts', args=['news'])
+        self.assertEqual(self.new(url, 0)['count'], 1)
+        self.group.slug = 'old-news'
+        self.group.save()
+        Group.objects.create(title='Новая', slug='news', description='')
+        self.assertEqual(self.new(url, 0), {
+            'count': 0, 'more': False, 'latest': 0,
+        })
+
+    @override_settings(NEW_POSTS_CAP=2)
+    def test_count_is_capped(self):
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        data = self.new(reverse('posts:api_new_posts'), self.post.pk)
+        self.assertEqual((data['count'], data['more']), (2, True))
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow_new_posts')
+        self.assertEqual(
+            self.client.get(url, {'since': 0}).status_code, 401
+        )
+        self.client.force_login(self.reader)
+        self.assertEqual(self.new(url, self.post.pk)['count'], 0)
+        Post.objects.create(text='Для подписчиков', author=self.author)
+        self.assertEqual(
+            self.new(url, self.post.pk), {'count': 1, 'more': False}
+        )
+
+    def test_bad_requests(self):
+        url = reverse('posts:api_new_posts')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'since': 'вчера'}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:api_group_new_posts', args=['missing']),
+                {'since': 0},
+            ).status_code,
+            404,
+        )
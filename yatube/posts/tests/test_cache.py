@@ -1,8 +1,18 @@
+import warnings
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.cache.backends.base import CacheKeyWarning
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
 from django.urls import reverse
-from posts.models import Post
+from django.utils.http import http_date
+from posts.models import Comment, Follow, Group, Post
+
+from core.caching import (LOCK_KEY, add_cache_tags, cache_page_tagged,
+                          get_or_compute, invalidate_tags)
 
 User = get_user_model()
 
@@ -28,12 +38,291 @@ class CacheTests(TestCase):
     def test_cache_index(self):
         """Проверка кеширования главной страницы."""
         response = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.bulk_create([
+            Post(text='Пост в обход сигналов', author=self.user)
+        ])
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_2.content)
+        cache.clear()
+        response_3 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_3.content)
+
+    def test_delete_invalidates_index(self):
+        """Удаление поста сразу сбрасывает кеш главной страницы."""
+        response = self.authorized_client.get(reverse('posts:index'))
         Post.objects.get(
             text='Мистер тестовый постик',
             author=self.user,
         ).delete()
         response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_2.content)
+        self.assertNotEqual(response.content, response_2.content)
+        self.assertNotContains(response_2, 'Мистер тестовый постик')
+
+    def test_create_invalidates_index(self):
+        """Новый пост сразу появляется на закешированной главной."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Совсем новый пост'}
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Совсем новый пост')
+
+
+class SharedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Woland')
+        cls.reader = User.objects.create_user(username='Ivan')
+        cls.post = Post.objects.create(
+            text='Общий для всех пост',
+            author=cls.author,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
         cache.clear()
-        response_3 = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content, response_3.content)
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_header_is_personal_on_shared_page(self):
+        """Общая страница дорисовывает шапку под каждого пользователя."""
+        url = reverse('posts:index')
+        guest_response = self.guest_client.get(url)
+        Post.objects.bulk_create([
+            Post(text='Пост в обход сигналов', author=self.author)
+        ])
+        reader_response = self.reader_client.get(url)
+        self.assertContains(guest_response, 'Войти')
+        self.assertNotContains(reader_response, 'Пост в обход сигналов')
+        self.assertContains(reader_response, 'Пользователь: Ivan')
+        self.assertNotContains(reader_response, 'Войти')
+
+    def test_follow_button_is_personal(self):
+        """Кнопка подписки на общей странице профиля своя у каждого."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(self.guest_client.get(url), 'Подписаться')
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        self.assertNotContains(self.author_client.get(url), 'Подписаться')
+
+    def test_follow_updates_follower_profile(self):
+        """После подписки профиль подписчика показывает новый счетчик."""
+        other = User.objects.create_user(username='Koroviev')
+        client = Client()
+        client.force_login(other)
+        url = reverse('posts:profile', args=[other.username])
+        self.assertContains(client.get(url), 'Подписок: 0')
+        client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertContains(client.get(url), 'Подписок: 1')
+
+    def test_group_cache_tags_are_safe_keys(self):
+        """Теги группы не содержат slug: ключи годятся для memcached."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            group = Group.objects.create(
+                title='Группа', slug='Группа с пробелом', description=''
+            )
+            Post.objects.create(text='Пост', author=self.author, group=group)
+            group.title = 'Новое имя'
+            group.save()
+
+    def test_group_rename_updates_group_page(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description=''
+        )
+        url = reverse('posts:group_list', args=[group.slug])
+        self.assertContains(self.guest_client.get(url), 'Группа')
+        group.title = 'Новое имя'
+        group.save()
+        self.assertContains(self.guest_client.get(url), 'Новое имя')
+
+    def test_comment_form_is_personal(self):
+        """Форма комментария с CSRF-токеном есть только у вошедших."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertNotContains(
+            self.guest_client.get(url), 'csrfmiddlewaretoken'
+        )
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'Редактировать запись')
+        self.assertContains(
+            self.author_client.get(url), 'Редактировать запись'
+        )
+
+
+    def test_shared_page_keeps_headers_and_cookies(self):
+        """Ответ посетителю несет заголовки и cookie представления."""
+        @cache_page_tagged(60, shared=True)
+        def view(request):
+            add_cache_tags(request, 'test')
+            response = HttpResponse('<p>Страница</p>')
+            response['Content-Length'] = 1
+            response['X-Robots-Tag'] = 'noindex'
+            response.set_cookie('seen', 'yes')
+            return response
+
+        for attempt in ('из представления', 'из кеша'):
+            with self.subTest(attempt=attempt):
+                response = view(RequestFactory().get('/shared/'))
+                self.assertEqual(response['X-Robots-Tag'], 'noindex')
+                self.assertEqual(response.cookies['seen'].value, 'yes')
+                self.assertFalse(response.has_header('Content-Length'))
+                self.assertContains(response, 'Страница')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Behemoth')
+        cls.post = Post.objects.create(
+            text='Пост с валидаторами',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_not_modified_without_view(self):
+        """Та же копия у клиента — 304 без запросов к базе."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+
+    def test_not_modified_since_on_private_page(self):
+        """Страница без общей шапки отвечает 304 и по дате."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            not_modified = self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_no_last_modified_on_shared_page(self):
+        """
+        Дата общей страницы не меняется при входе, поэтому ее нет:
+        запрос только с If-Modified-Since получает свою шапку.
+        """
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        since = http_date()
+        self.assertEqual(
+            self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=since
+            ).status_code,
+            200,
+        )
+        self.guest_client.force_login(self.author)
+        response = self.guest_client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Пользователь: Behemoth')
+
+    def test_etag_changes_with_tags(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий'
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Свежий')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_is_personal_on_shared_page(self):
+        """Копия гостя не подходит вошедшему пользователю."""
+        url = reverse('posts:profile', args=[self.author.username])
+        etag = self.guest_client.get(url)['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            self.author_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304,
+        )
+
+
+class StampedeProtectionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Stravinsky')
+        cls.post = Post.objects.create(
+            text='Пост из кеша',
+            author=cls.user,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='значение'):
+        self.calls += 1
+        return f'{value} {self.calls}', ['test']
+
+    def test_stale_copy_served_while_refreshing(self):
+        """Пока запись пересчитывает другой процесс, отдается старая."""
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        invalidate_tags('test')
+        cache.add(LOCK_KEY % 'key', True, 60)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 1')
+        self.assertEqual(self.calls, 1)
+        cache.delete(LOCK_KEY % 'key')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'значение 2')
+
+    def test_waiter_stops_when_lock_released_empty(self):
+        """
+        Если держатель блокировки ничего не сохранил, ожидающий
+        пересчитывает сразу, а не ждет CACHE_LOCK_TIMEOUT.
+        """
+        cache.add(LOCK_KEY % 'key', True, 60)
+        with mock.patch(
+            'core.caching.time.sleep',
+            side_effect=lambda seconds: cache.delete(LOCK_KEY % 'key'),
+        ) as sleep:
+            value = get_or_compute(
+                'key', lambda: ('без тегов', None), 60
+            )
+        self.assertEqual(value, 'без тегов')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_early_refresh_before_expiry(self):
+        """При большом beta запись обновляется до истечения TTL."""
+        get_or_compute('key', self.compute, 60)
+        entry = cache.get('key')
+        entry['delta'] = 60
+        cache.set('key', entry)
+        self.assertEqual(
+            get_or_compute('key', self.compute, 60, beta=1000), 'значение 2'
+        )
+
+    def test_stale_if_error(self):
+        """Если база недоступна, главная отдается из устаревшей копии."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        invalidate_tags('feed')
+        with mock.patch(
+            'posts.views.paginator_util', side_effect=OperationalError
+        ), self.assertLogs('core.caching', 'WARNING'):
+            stale_response = self.client.get(url)
+        self.assertEqual(stale_response.status_code, 200)
+        self.assertEqual(response.content, stale_response.content)
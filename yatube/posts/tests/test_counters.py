@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Margarita')
+        cls.reader = User.objects.create_user(username='Master')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='counters',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Другая группа',
+            slug='counters-2',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_post_create_and_delete(self):
+        """Посты учитываются у автора и группы, удаление вычитается."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост', 'group': self.group.pk},
+        )
+        self.assertCounters(self.user.stats, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        Post.objects.get(author=self.user).delete()
+        self.assertCounters(self.user.stats, posts_count=0)
+        self.assertCounters(self.group, posts_count=0)
+
+    def test_post_moves_between_groups(self):
+        """Смена группы при редактировании переносит счетчик."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Пост', 'group': self.group_2.pk},
+        )
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.group_2, posts_count=1)
+
+    def test_comments_count(self):
+        """Комментарии учитываются у поста."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            data={'text': 'Комментарий'},
+        )
+        self.assertCounters(post, comments_count=1)
+        Comment.objects.all().delete()
+        self.assertCounters(post, comments_count=0)
+
+    def test_drifted_counter_stays_at_zero(self):
+        """Удаление при разошедшемся счетчике не уводит его ниже нуля."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        UserStats.objects.filter(user=self.user).update(posts_count=0)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        Comment.objects.all().delete()
+        self.assertCounters(post, comments_count=0)
+        post.delete()
+        self.assertCounters(self.user.stats, posts_count=0)
+        self.assertCounters(self.group, posts_count=0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счетчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters(self.user.stats, followers_count=1)
+        self.assertCounters(self.reader.stats, following_count=1)
+        follow.delete()
+        self.assertCounters(self.user.stats, followers_count=0)
+        self.assertCounters(self.reader.stats, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=42)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(self.user.stats, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -87,7 +88,9 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 text='Тестовый пост 2',
                 group=self.group.pk,
-                image='posts/small.gif'
+                image='posts/{0:.2}/{0}.gif'.format(
+                    hashlib.sha256(small_gif).hexdigest()
+                )
             ).exists()
         )
 
@@ -155,3 +158,46 @@ class PostCreateFormTests(TestCase):
                 text='Тестовый комментарий',
             ).exists()
         )
+
+    @override_settings(UPLOAD_IMAGE_MAX_BYTES=16)
+    def test_oversized_image_rejected(self):
+        """Слишком большой файл отклоняется формой, пост не создается."""
+        posts_count = Post.objects.count()
+        uploaded = SimpleUploadedFile(
+            name='big.gif', content=b'\x00' * 1024, content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': uploaded},
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 16\xa0байт.'
+        )
+
+    @override_settings(UPLOAD_IMAGE_MAX_BYTES=16)
+    def test_fields_after_rejected_image_kept(self):
+        """
+        Поля после отклоненного файла доходят до формы, и CSRF
+        проверяется, хотя обработчик загрузок ставит само представление.
+        """
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        url = reverse('posts:post_create')
+        client.get(url)
+        uploaded = SimpleUploadedFile(
+            name='big.gif', content=b'\x00' * 1024, content_type='image/gif'
+        )
+        data = {'image': uploaded, 'text': 'Текст после картинки'}
+        self.assertTemplateUsed(
+            client.post(url, data=data), 'core/403csrf.html'
+        )
+        uploaded.seek(0)
+        data['csrfmiddlewaretoken'] = client.cookies['csrftoken'].value
+        response = client.post(url, data=data)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 16\xa0байт.'
+        )
+        self.assertEqual(
+            response.context['form']['text'].value(), 'Текст после картинки'
+        )
@@ -0,0 +1,78 @@
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from core.testing import isolated_files
+
+from .. import media
+from ..models import Comment, MediaFile, Post, User
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class MediaReferenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reposter')
+
+    @classmethod
+    def setUpClass(cls):
+        # Свои загрузки у каждого класса, во временном каталоге.
+        cls.isolation = ExitStack()
+        cls.isolation.enter_context(isolated_files())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.isolation.close()
+
+    def upload(self, model, **fields):
+        instance = model(author=self.user, text='Мем', **fields)
+        instance.image.save('meme.gif', ContentFile(SMALL_GIF), save=False)
+        instance.save()
+        return instance
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).references
+
+    def test_same_image_shared_by_posts_and_comments(self):
+        """Одна картинка в посте и комментарии — один файл, две ссылки."""
+        post = self.upload(Post)
+        comment = self.upload(Comment, post=post)
+        self.assertEqual(post.image.name, comment.image.name)
+        self.assertEqual(self.references(post.image.name), 2)
+        comment.delete()
+        self.assertEqual(self.references(post.image.name), 1)
+
+    def test_edit_moves_reference(self):
+        post = self.upload(Post)
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image.save('other.gif', ContentFile(SMALL_GIF + b'\x00'))
+        self.assertEqual(self.references(old_name), 0)
+        self.assertEqual(self.references(post.image.name), 1)
+        post.text = 'Без новой картинки'
+        post.save()
+        self.assertEqual(self.references(post.image.name), 1)
+
+    def test_collect_removes_unreferenced_files(self):
+        """Файл без ссылок удаляется только после grace."""
+        post = self.upload(Post)
+        name = post.image.name
+        post.delete()
+        self.assertEqual(media.collect(timedelta(hours=1)), 0)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(media.collect(timedelta(seconds=-1)), 1)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
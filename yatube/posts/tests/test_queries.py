@@ -0,0 +1,131 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import POSTS_PER_PAGE
+
+from ..models import Comment, Follow, Group, Post, User
+from .query_budget import query_budget
+
+NUMBER_OF_POSTS = POSTS_PER_PAGE + 5
+NUMBER_OF_COMMENTS = 5
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Потолок запросов для каждого URL из posts/urls.py.
+    Данных больше, чем помещается на страницу, поэтому любой
+    N+1 в шаблонах сразу выводит число запросов за бюджет.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.readers = [
+            User.objects.create_user(username=f'reader_{number}')
+            for number in range(NUMBER_OF_COMMENTS)
+        ]
+        cls.reader = cls.readers[0]
+        cls.author = User.objects.create_user(
+            username='Korovyev', first_name='Коровьев'
+        )
+        cls.other = User.objects.create_user(username='Hella')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.other)
+        for number in range(NUMBER_OF_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=(cls.author, cls.other)[number % 2],
+                group=cls.group,
+            )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for reader in cls.readers:
+            Comment.objects.create(
+                post=cls.post, author=reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_index(self):
+        with query_budget(3):
+            self.reader_client.get(reverse('posts:index'))
+
+    def test_index_fragment(self):
+        with query_budget(1):
+            self.reader_client.get(reverse('posts:index_fragment'))
+
+    def test_group_list(self):
+        with query_budget(4):
+            self.reader_client.get(
+                reverse('posts:group_list', args=[self.group.slug])
+            )
+
+    def test_profile(self):
+        with query_budget(5):
+            self.reader_client.get(
+                reverse('posts:profile', args=[self.author.username])
+            )
+
+    def test_post_detail(self):
+        with query_budget(4):
+            self.reader_client.get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            )
+
+    def test_post_comments(self):
+        with query_budget(2):
+            self.reader_client.get(
+                reverse('posts:post_comments', args=[self.post.pk])
+            )
+
+    def test_post_create(self):
+        with query_budget(5):
+            self.author_client.get(reverse('posts:post_create'))
+
+    def test_post_edit(self):
+        with query_budget(6):
+            self.author_client.get(
+                reverse('posts:post_edit', args=[self.post.pk])
+            )
+
+    def test_add_comment(self):
+        # Комментарий сразу попадает в индекс поиска.
+        with query_budget(8):
+            self.reader_client.post(
+                reverse('posts:add_comment', args=[self.post.pk]),
+                data={'text': 'Еще комментарий'},
+            )
+
+    def test_search(self):
+        with query_budget(4):
+            self.reader_client.get(reverse('posts:search'), {'q': 'пост'})
+
+    def test_follow_index(self):
+        with query_budget(4):
+            self.reader_client.get(reverse('posts:follow_index'))
+
+    def test_profile_follow(self):
+        with query_budget(14):
+            self.author_client.get(
+                reverse('posts:profile_follow', args=[self.other.username])
+            )
+
+    def test_profile_unfollow(self):
+        with query_budget(11):
+            self.reader_client.get(
+                reverse('posts:profile_unfollow', args=[self.author.username])
+            )
+
+    def test_groups(self):
+        with query_budget(4):
+            self.reader_client.get(reverse('posts:groups'))
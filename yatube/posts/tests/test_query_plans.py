@@ -0,0 +1,109 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_PER_PAGE
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTests(TestCase):
+    """
+    Основной запрос каждой ленты читает строки по индексу
+    в нужном порядке: без полного просмотра таблицы
+    и без сортировки во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Azazello')
+        cls.reader = User.objects.create_user(username='Margarita')
+        cls.group = Group.objects.create(
+            title='Свита', slug='retinue', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(POSTS_PER_PAGE + 1):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def main_queries(self, url, table, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if re.search(rf'FROM "{table}"', query['sql'])
+            and 'ORDER BY' in query['sql']
+        ]
+        self.assertTrue(queries, f'{url}: нет запроса к {table}')
+        return response, queries
+
+    def assertUsesIndex(self, sql, table):
+        plan = self.plan(sql)
+        self.assertFalse(
+            [step for step in plan if 'TEMP B-TREE' in step],
+            f'Сортировка без индекса: {plan}\n{sql}',
+        )
+        self.assertTrue(
+            [step for step in plan if re.match(
+                rf'(SCAN|SEARCH) {table} USING (COVERING )?INDEX', step
+            )],
+            f'Индекс не используется: {plan}\n{sql}',
+        )
+
+    def test_feeds_read_by_index(self):
+        feeds = {
+            reverse('posts:index'): 'posts_post',
+            reverse('posts:group_list', args=[self.group.slug]):
+                'posts_post',
+            reverse('posts:profile', args=[self.author.username]):
+                'posts_post',
+            reverse('posts:post_detail', args=[self.post.pk]):
+                'posts_comment',
+            reverse('posts:follow_index'): 'posts_timelineentry',
+        }
+        for url, table in feeds.items():
+            with self.subTest(url=url):
+                response, queries = self.main_queries(url, table)
+                for sql in queries:
+                    self.assertUsesIndex(sql, table)
+                page = response.context.get('page_obj')
+                if page is None or not page.has_next():
+                    continue
+                cache.clear()
+                _, queries = self.main_queries(
+                    url, table, {'cursor': page.next_cursor}
+                )
+                for sql in queries:
+                    self.assertUsesIndex(sql, table)
+
+    def test_follow_check_uses_unique_index(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(
+                reverse('posts:profile', args=[self.author.username])
+            )
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_follow"' in query['sql']
+        ]
+        self.assertTrue(queries)
+        for sql in queries:
+            self.assertUsesIndex(sql, 'posts_follow')
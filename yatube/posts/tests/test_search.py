@@ -0,0 +1,92 @@
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Коты захватили интернет'
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про собак')
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        page = search.SearchPaginator(query, 10).get_page(None)
+        return [post.pk for post in page]
+
+    def test_index_follows_saves_and_deletes(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(self.found('коты'), [post.pk])
+        post.text = 'Кошки захватили интернет'
+        post.save()
+        self.assertEqual(self.found('коты'), [])
+        self.assertEqual(self.found('кошки'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('кошки'), [])
+
+    def test_comment_finds_post_below_post_match(self):
+        """Пост находится и по комментарию, но ниже совпадения в посте."""
+        Comment.objects.create(
+            author=self.user, post=self.other, text='Коты лучше'
+        )
+        self.assertEqual(self.found('коты'), [self.post.pk, self.other.pk])
+
+    def test_hits_not_materialized(self):
+        """Запрос не требует AS MATERIALIZED и не копит совпадения."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN QUERY PLAN ' + search.SEARCH,
+                [search.match_expression('коты')],
+            )
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertNotIn('MATERIALIZED', search.SEARCH)
+        self.assertIn('CO-ROUTINE hits', plan)
+
+    def test_prefix_and_operators_in_query(self):
+        self.assertEqual(self.found('интер'), [self.post.pk])
+        self.assertEqual(self.found('коты OR -"собак'), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_view_paginates_by_cursor(self):
+        Post.objects.create(author=self.user, text='Коты и собаки')
+        response = self.client.get(reverse('posts:search'), {'q': 'коты'})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 1)
+        self.assertContains(
+            response, '?q=%D0%BA%D0%BE%D1%82%D1%8B&amp;cursor='
+        )
+        second = self.client.get(
+            reverse('posts:search'), {'q': 'коты', 'cursor': page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(second[0].pk, page[0].pk)
+        self.assertFalse(second.has_next())
+
+    def test_rebuild_restores_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.found('коты'), [])
+        self.assertEqual(search.rebuild(batch_size=1), {
+            'posts': 2, 'comments': 0,
+        })
+        self.assertEqual(self.found('коты'), [self.post.pk])
+
+    def test_admin_search_uses_index(self):
+        admin = site._registry[Post]
+        request = RequestFactory().get('/')
+        queryset, duplicates = admin.get_search_results(
+            request, Post.objects.all(), 'собак'
+        )
+        self.assertEqual(list(queryset), [self.other])
+        self.assertFalse(duplicates)
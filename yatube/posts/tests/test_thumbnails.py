@@ -0,0 +1,141 @@
+import io
+import threading
+from contextlib import ExitStack
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default as sorl
+
+from core.testing import isolated_files
+
+from .. import thumbnails
+from ..models import Post, User
+
+
+def photo(width=1200, height=900):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(
+    THUMBNAIL_WIDTHS=(320, 640),
+    THUMBNAIL_FORMATS=('WEBP',),
+)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Свои загрузки у каждого класса, во временном каталоге.
+        cls.isolation = ExitStack()
+        cls.isolation.enter_context(isolated_files())
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.isolation.close()
+
+    def setUp(self):
+        cache.clear()
+        self.name = default_storage.save('posts/photo.jpg', photo())
+
+    def test_variants(self):
+        """Для размера строятся ширины из настроек во всех форматах."""
+        self.assertEqual(thumbnails.variants('x750'), [
+            ('x750', None),
+            ('320x750', None),
+            ('640x750', None),
+            ('320x750', 'WEBP'),
+            ('640x750', 'WEBP'),
+            ('x750', 'WEBP'),
+        ])
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_schedule_generates_thumbnails(self):
+        """Варианты попадают в хранилище sorl и потом не строятся."""
+        tasks = thumbnails.variants('x750')
+        thumbnails.schedule(self.name, tasks)
+        with mock.patch.object(
+            sorl.engine, 'create', side_effect=AssertionError
+        ):
+            for geometry, image_format in tasks:
+                thumbnail = thumbnails.safe_thumbnail(
+                    self.name, geometry, image_format
+                )
+                self.assertTrue(default_storage.exists(thumbnail.name))
+                self.assertEqual(
+                    thumbnail.name,
+                    thumbnails.thumbnail_file(
+                        self.name, geometry, image_format
+                    ).name,
+                )
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_concurrent_requests_coalesced(self):
+        """Пока миниатюра строится, повторная задача не ставится."""
+        release = threading.Event()
+        calls = []
+
+        def slow_generate(*task):
+            calls.append(task)
+            release.wait(5)
+
+        with mock.patch.object(thumbnails, 'generate', slow_generate):
+            first = thumbnails.schedule(self.name, [('x750', None)])
+            second = thumbnails.schedule(self.name, [('x750', None)])
+            self.assertIs(first[0], second[0])
+            release.set()
+            first[0].result(5)
+        self.assertEqual(calls, [(self.name, 'x750', None)])
+
+    def test_thumbnail_generation_locked_between_processes(self):
+        """Миниатюру, которую строит другой процесс, не строим еще раз."""
+        with mock.patch.object(thumbnails, 'get_thumbnail') as get:
+            with mock.patch.object(cache, 'add', return_value=False):
+                thumbnails.generate(self.name, 'x750')
+        get.assert_not_called()
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_prefetch_page_in_one_lookup(self):
+        """Варианты всей страницы находятся одним запросом к базе."""
+        author = User.objects.create_user(username='Painter')
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=author,
+                                image=self.name)
+            for number in range(3)
+        ] + [Post.objects.create(text='Без картинки', author=author)]
+        thumbnails.schedule(self.name, thumbnails.variants('x750'))
+        cache.clear()
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail', side_effect=AssertionError
+        ), self.assertNumQueries(1):
+            thumbnails.prefetch(posts, 'x750')
+        image = posts[0].prefetched_thumbnails['x750']
+        self.assertEqual((image.width, image.height), (1000, 750))
+        self.assertEqual(image.srcset.count('w,'), 2)
+        self.assertEqual(image.sources[0]['type'], 'image/webp')
+        self.assertIn(' 320w', image.sources[0]['srcset'])
+        self.assertIs(posts[2].prefetched_thumbnails['x750'], image)
+        self.assertIsNone(posts[3].prefetched_thumbnails['x750'])
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts, 'x750')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_responsive_image_tag(self):
+        """Шаблон выводит <picture> со srcset, размерами и lazy."""
+        author = User.objects.create_user(username='Painter')
+        post = Post.objects.create(text='Пост', author=author,
+                                   image=self.name)
+        thumbnails.schedule(self.name, thumbnails.variants('x600'))
+        html = Template(
+            '{% load image_thumbnails %}{% responsive_image post "x600" %}'
+        ).render(Context({'post': post}))
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('width="800" height="600"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(' 640w', html)
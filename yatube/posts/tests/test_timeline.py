@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Azazello')
+        cls.author = User.objects.create_user(username='Behemoth')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются прежние посты автора."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=self.old_post
+            ).exists()
+        )
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост записывается в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FAN_OUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора не рассылаются, а читаются из Post."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FAN_OUT_LIMIT=1)
+    def test_missed_posts_backfilled_below_limit(self):
+        """
+        Когда автор снова под лимитом, посты, написанные без fan-out,
+        появляются в лентах оставшихся подписчиков.
+        """
+        other = User.objects.create_user(username='Gella')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        Follow.objects.get(user=other, author=self.author).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.old_post])
@@ -1,14 +1,18 @@
 from django import forms
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from yatube.settings import POSTS_PER_PAGE
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
-from ..models import Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import NEXT, encode_cursor
 
 NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE = 3
+NUMBER_OF_EXTRA_COMMENTS = 3
 
 
 class PostPagesTests(TestCase):
@@ -89,9 +93,8 @@ class PostPagesTests(TestCase):
         cache.clear()
         """Функция для проверки контекста страниц с page_obj в контексте."""
         self.assertTrue(
-            response.context.get(
-                'page_obj'
-            ).paginator.count >= 1, 'На странице нет постов'
+            len(response.context.get('page_obj')) >= 1,
+            'На странице нет постов'
         )
         first_object = response.context['page_obj'][0]
         objects = {
@@ -307,51 +310,182 @@ class PaginatorViewsTest(TestCase):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def feed_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list', kwargs={
+                    'slug': self.group.slug
+                }
+            ),
+            reverse(
+                'posts:profile', kwargs={
+                    'username': self.user.username
+                }
+            ),
+        )
+
     def test_index_first_page_contains_ten_records(self):
         cache.clear()
         """
         В шаблонах index, group_list и profile на первой странице
         отображается 10 постов, на второй странице - 3 поста.
         """
-        field_paginator = {
-            self.authorized_client.get(reverse('posts:index')): POSTS_PER_PAGE,
-            self.authorized_client.get(
-                reverse(
-                    'posts:group_list', kwargs={
-                        'slug': self.group.slug
-                    }
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.authorized_client.get(url).context[
+                    'page_obj'
+                ]
+                self.assertEqual(len(first_page), POSTS_PER_PAGE)
+                self.assertFalse(first_page.has_previous())
+                cache.clear()
+                second_page = self.authorized_client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE
                 )
-            ): POSTS_PER_PAGE,
-            self.authorized_client.get(
-                reverse(
-                    'posts:profile', kwargs={
-                        'username': self.user.username
-                    }
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(
+                    set(first_page).isdisjoint(set(second_page))
                 )
-            ): POSTS_PER_PAGE,
-            self.client.get(
-                reverse('posts:index') + '?page=2'
-            ): NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE,
-            self.authorized_client.get(
-                reverse(
-                    'posts:group_list', kwargs={
-                        'slug': self.group.slug
-                    }
-                ) + '?page=2'
-            ): NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE,
-            self.authorized_client.get(
-                reverse(
-                    'posts:profile', kwargs={
-                        'username': self.user.username
-                    }
-                ) + '?page=2'
-            ): NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE,
-        }
-        for response, expected_value in field_paginator.items():
-            with self.subTest(response=response):
+
+    def test_previous_cursor_returns_first_page(self):
+        """Ссылка «Предыдущая» возвращает на ту же первую страницу."""
+        url = reverse('posts:index')
+        first_page = self.client.get(url).context['page_obj']
+        cache.clear()
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        cache.clear()
+        previous_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный токен курсора открывает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), POSTS_PER_PAGE
+        )
+
+    def test_tampered_cursor_shows_first_page(self):
+        """Токен с чужими значениями ключа не роняет ленту."""
+        cursor = encode_cursor(NEXT, ['garbage', 'not-an-id'])
+        for url in (
+            *self.feed_urls(),
+            reverse('posts:index_fragment'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
                 self.assertEqual(
-                    len(response.context['page_obj']), expected_value
+                    len(response.context['page_obj']), POSTS_PER_PAGE
+                )
+
+    def test_fragments_continue_feed(self):
+        """Фрагмент ленты — только посты следующей страницы."""
+        fragment_urls = (
+            reverse('posts:index_fragment'),
+            reverse('posts:group_list_fragment', args=[self.group.slug]),
+            reverse('posts:profile_fragment', args=[self.user.username]),
+        )
+        for url, fragment_url in zip(self.feed_urls(), fragment_urls):
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.client.get(url)
+                cursor = first_page.context['page_obj'].next_cursor
+                self.assertContains(
+                    first_page, f'data-load-more="{fragment_url}?cursor='
                 )
+                response = self.client.get(fragment_url, {'cursor': cursor})
+                self.assertTemplateUsed(response, 'includes/post_list.html')
+                self.assertTemplateNotUsed(response, 'base.html')
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    NUMBER_OF_POSTS_FOR_THE_SECOND_PAGE,
+                )
+                self.assertNotContains(response, 'data-load-more')
+
+    def test_follow_fragment(self):
+        reader = User.objects.create_user(username='Abadonna')
+        Follow.objects.create(user=reader, author=self.user)
+        self.client.force_login(reader)
+        response = self.client.get(reverse('posts:follow_index_fragment'))
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        self.assertContains(response, 'data-load-more')
+
+
+        """Лента строится без запроса COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Gella')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user
+        )
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {n}')
+            for n in range(COMMENTS_PER_PAGE + NUMBER_OF_EXTRA_COMMENTS)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_newest_comments(self):
+        """На странице поста только последние COMMENTS_PER_PAGE."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(
+            list(comments),
+            list(self.post.comments.order_by('-created', '-id')[
+                :COMMENTS_PER_PAGE
+            ]),
+        )
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', args=[self.post.pk])
+            + '?cursor=' + comments.next_cursor,
+        )
+
+    def test_fragment_continues_by_cursor(self):
+        """Фрагмент отдает следующие комментарии без обвязки страницы."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(len(rest), NUMBER_OF_EXTRA_COMMENTS)
+        self.assertFalse(rest.has_next())
+        self.assertTrue(set(first).isdisjoint(set(rest)))
+        self.assertNotContains(response, 'data-load-more')
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(reverse('posts:post_comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
 
 
 class CreatingPostTests(TestCase):
@@ -438,4 +572,4 @@ class CreatingPostTests(TestCase):
                 }
             ),
         )
-        self.assertEqual(response.context.get('page_obj').paginator.count, 0)
+        self.assertEqual(len(response.context.get('page_obj')), 0)
@@ -0,0 +1,290 @@
+"""
+Миниатюры картинок строятся сразу после сохранения поста или
+комментария, в фоновом потоке, а не при первом показе страницы.
+
+Для каждого размера из шаблона ('x750') строятся варианты разной
+ширины в формате по умолчанию и в современных форматах (WebP),
+шаблон выводит их через <picture> и srcset.
+
+Одинаковые задачи склеиваются: внутри процесса — по очереди задач,
+между процессами — блокировкой в кеше, поэтому каждый вариант
+картинки строится один раз.
+
+Для страницы ленты варианты всех постов находятся одним запросом
+к кешу (prefetch), а шаблон берет готовые адреса тегом responsive_image.
+
+Имена миниатюр и ключи хранилища sorl вычисляются теми же внутренними
+функциями sorl, что и в get_thumbnail, поэтому версия sorl-thumbnail
+закреплена в requirements.txt.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'thumbnail:%s:lock'
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def source(image):
+    """
+    Исходник для sorl. Имя строкой sorl искал бы в хранилище
+    миниатюр, а картинки лежат в хранилище загрузок.
+    """
+    if isinstance(image, str):
+        return ImageFile(image, default_storage)
+    return image
+
+
+def variants(base):
+    """
+    Варианты миниатюры base ('x750') — пары (геометрия, формат).
+    Первая пара — сама base в формате по умолчанию (None),
+    она же src для <img>.
+    """
+    result = [(base, None)]
+    for image_format in (None, *settings.THUMBNAIL_FORMATS):
+        result += [
+            (f'{width}{base}', image_format)
+            for width in settings.THUMBNAIL_WIDTHS
+        ]
+        if image_format is not None:
+            result.append((base, image_format))
+    return result
+
+
+def variants_for(instance):
+    """Все варианты, которые показывают шаблоны для этой модели."""
+    return [
+        variant
+        for base in settings.THUMBNAIL_GEOMETRIES.get(
+            instance._meta.label, ()
+        )
+        for variant in variants(base)
+    ]
+
+
+def _options(image_format):
+    return {} if image_format is None else {'format': image_format}
+
+
+def generate(name, geometry, image_format=None):
+    """Строит миниатюру, если ее не строит другой процесс."""
+    digest = hashlib.md5(
+        f'{name}|{geometry}|{image_format}'.encode()
+    ).hexdigest()
+    lock_key = LOCK_KEY % digest
+    if not cache.add(lock_key, True, settings.CACHE_LOCK_TIMEOUT):
+        return
+    try:
+        get_thumbnail(source(name), geometry, **_options(image_format))
+    finally:
+        cache.delete(lock_key)
+
+
+def _run(name, geometry, image_format):
+    try:
+        generate(name, geometry, image_format)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s %s %s',
+                         name, geometry, image_format)
+    finally:
+        connections.close_all()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def schedule(name, tasks):
+    """
+    Ставит варианты картинки (геометрия, формат) в очередь
+    и возвращает их задачи. При THUMBNAIL_WORKERS = 0 строит их сразу.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        for geometry, image_format in tasks:
+            generate(name, geometry, image_format)
+        return []
+    pool = _pool()
+    futures = []
+    for geometry, image_format in tasks:
+        key = (name, geometry, image_format)
+        with _lock:
+            future = _pending.get(key)
+            created = future is None
+            if created:
+                future = _pending[key] = pool.submit(_run, *key)
+        if created:
+            future.add_done_callback(
+                lambda done, key=key: _forget(key, done)
+            )
+        futures.append(future)
+    return futures
+
+
+def _forget(key, future):
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def safe_thumbnail(image, geometry, image_format=None):
+    """get_thumbnail, который, как {% thumbnail %}, не роняет страницу."""
+    try:
+        return get_thumbnail(
+            source(image), geometry, **_options(image_format)
+        )
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s %s',
+                         image, geometry)
+        return None
+
+
+def thumbnail_file(image, geometry, image_format=None):
+    """
+    Файл миниатюры с теми же опциями, что у get_thumbnail:
+    имя вычисляется без обращений к хранилищу и кешу.
+    """
+    backend = default.backend
+    original = ImageFile(source(image))
+    options = _options(image_format)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(original))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(original, geometry, options),
+        default.storage,
+    )
+
+
+def _lookup(keys):
+    """Значения хранилища sorl: один get_many к кешу и один запрос к базе."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        found = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in found.items() if value}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {key: rows.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        found.update(rows)
+    return {
+        key: value for key, value in found.items() if value != EMPTY_VALUE
+    }
+
+
+class ResponsiveImage:
+    """Миниатюра для <picture>: src и варианты по форматам."""
+
+    def __init__(self, src, files):
+        self.src = src
+        self.files = files
+
+    @property
+    def width(self):
+        return self.src.width
+
+    @property
+    def height(self):
+        return self.src.height
+
+    @staticmethod
+    def _srcset(files):
+        urls = {}
+        for file in files:
+            urls.setdefault(file.width, file.url)
+        return ', '.join(
+            f'{url} {width}w' for width, url in sorted(urls.items())
+        )
+
+    @property
+    def srcset(self):
+        """Варианты в формате по умолчанию — для самого <img>."""
+        return self._srcset([*self.files.get(None, ()), self.src])
+
+    @property
+    def sources(self):
+        """Варианты в современных форматах — для <source>."""
+        return [
+            {'type': MIME_TYPES[image_format], 'srcset': self._srcset(files)}
+            for image_format, files in self.files.items()
+            if image_format is not None
+        ]
+
+
+def prefetch(objects, base):
+    """
+    Находит все варианты миниатюры base для картинок objects разом
+    и кладет их в obj.prefetched_thumbnails[base]. Если нет даже src,
+    он строится здесь же, как это сделал бы {% thumbnail %}; остальные
+    варианты строятся при загрузке или командой generate_thumbnails.
+    """
+    wanted = variants(base)
+    images = {}
+    for obj in objects:
+        obj.__dict__.setdefault('prefetched_thumbnails', {})[base] = None
+        if obj.image:
+            images.setdefault(obj.image.name, obj.image)
+    keys = {
+        (name, *variant): add_prefix(thumbnail_file(image, *variant).key)
+        for name, image in images.items()
+        for variant in wanted
+    }
+    found = _lookup(list(set(keys.values()))) if keys else {}
+    responsive = {}
+    for name, image in images.items():
+        files = {}
+        for variant in wanted:
+            value = found.get(keys[(name, *variant)])
+            if value is not None:
+                files.setdefault(variant, deserialize_image_file(value))
+        src = files.pop(wanted[0], None) or safe_thumbnail(image, base)
+        if src is None:
+            continue
+        by_format = {}
+        for (_, image_format), file in files.items():
+            by_format.setdefault(image_format, []).append(file)
+        responsive[name] = ResponsiveImage(src, by_format)
+    for obj in objects:
+        if obj.image:
+            obj.prefetched_thumbnails[base] = responsive.get(obj.image.name)
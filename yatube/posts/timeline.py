@@ -0,0 +1,156 @@
+from django.conf import settings
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import PREVIOUS, CursorPaginator, seek
+
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+
+def is_fan_out_author(author_id):
+    """
+    Посты авторов с огромным числом подписчиков по лентам не рассылаются:
+    их читатели подтягивают такие посты сами при чтении ленты.
+    """
+    return not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FAN_OUT_LIMIT,
+    ).exists()
+
+
+def pulled_author_ids(user):
+    """Авторы из подписок user, чьи посты читаются без fan-out."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=(
+                settings.TIMELINE_FAN_OUT_LIMIT
+            ),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fan_out_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=follower_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for follower_id in follower_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _backfill(user_ids, author_id):
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT])
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in user_ids
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Дозаполняет ленту свежими постами автора после подписки."""
+    if is_fan_out_author(author_id):
+        _backfill([user_id], author_id)
+
+
+def resume_fan_out(author_id):
+    """
+    После отписки: если автор только что опустился до
+    TIMELINE_FAN_OUT_LIMIT, его посты снова читаются из лент, поэтому
+    написанные без fan-out дозаполняются в ленты всех подписчиков.
+    """
+    if UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FAN_OUT_LIMIT,
+    ).exists():
+        _backfill(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True
+            ),
+            author_id,
+        )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    for author_id in Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True):
+        backfill(user_id, author_id)
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок: диапазон из материализованной ленты пользователя,
+    дополненный постами авторов без fan-out.
+    Курсоры совместимы с обычными лентами, ключ — (pub_date, id).
+    related и only — связи и колонки поста, которые нужно загрузить
+    (по умолчанию все колонки, автор и группа).
+    """
+
+    def __init__(self, user, per_page, related=('author', 'group'),
+                 only=None):
+        self.user = user
+        self.related = tuple(related)
+        self.only = only
+        self.pulled = pulled_author_ids(user)
+        posts = Post.objects.filter(
+            author_id__in=self.pulled
+        ).select_related(*self.related)
+        if only is not None:
+            posts = posts.only(*only)
+        super().__init__(posts, per_page)
+
+    def fetch(self, direction, values, limit):
+        entries = TimelineEntry.objects.filter(user=self.user).select_related(
+            'post', *(f'post__{name}' for name in self.related)
+        )
+        if self.only is not None:
+            entries = entries.only(
+                'pub_date', 'post', *(f'post__{name}' for name in self.only)
+            )
+        entries = seek(entries, TIMELINE_ORDERING, values, direction)[:limit]
+        posts = [entry.post for entry in entries]
+        if not self.pulled:
+            return posts
+        posts += super().fetch(direction, values, limit)
+        posts = sorted(
+            {post.id: post for post in posts}.values(),
+            key=self.key,
+            reverse=direction != PREVIOUS,
+        )
+        return posts[:limit]
+
+
+def follow_page(user, request):
+    return TimelinePaginator(user, settings.POSTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
@@ -1,23 +1,49 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path(
+        'feed/', views.index, {'fragment': True}, name='index_fragment'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts, name='group_list'
     ),
+    path(
+        'group/<slug:slug>/feed/',
+        views.group_posts,
+        {'fragment': True},
+        name='group_list_fragment'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/',
+        views.profile,
+        {'fragment': True},
+        name='profile_fragment'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'follow/feed/',
+        views.follow_index,
+        {'fragment': True},
+        name='follow_index_fragment'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -29,4 +55,38 @@ urlpatterns = [
         name='profile_unfollow'
     ),
     path('groups/', views.groups, name='groups'),
+    path('search/', views.search, name='search'),
+    path('api/posts/', api.posts, name='api_posts'),
+    path(
+        'api/groups/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/authors/<str:username>/posts/',
+        api.author_posts,
+        name='api_author_posts'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'
+    ),
+    path('api/follow/', api.follow_posts, name='api_follow_posts'),
+    path('api/posts/new/', api.new_posts, name='api_new_posts'),
+    path(
+        'api/groups/<slug:slug>/posts/new/',
+        api.group_new_posts,
+        name='api_group_new_posts'
+    ),
+    path(
+        'api/authors/<str:username>/posts/new/',
+        api.author_new_posts,
+        name='api_author_new_posts'
+    ),
+    path(
+        'api/follow/new/',
+        api.follow_new_posts,
+        name='api_follow_new_posts'
+    ),
 ]
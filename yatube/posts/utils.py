@@ -1,10 +1,190 @@
+import base64
+import binascii
+import collections.abc
+import json
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    payload = [direction] + [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering, converters=None):
+    """
+    Распаковывает токен курсора. Значения приводятся к типам полей
+    model из ordering или функциями converters, если они переданы.
+    Возвращает (направление, значения) или (None, None) для битого токена.
+    """
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = json.loads(raw.decode())
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(ordering):
+            return None, None
+        if converters is None:
+            converters = [
+                model._meta.get_field(field.lstrip('-')).to_python
+                for field in ordering
+            ]
+        values = [
+            convert(value) for convert, value in zip(converters, values)
+        ]
+    except (
+        binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+        ValidationError,
+    ):
+        return None, None
+    if any(value is None for value in values):
+        return None, None
+    return direction, values
+
+
+def seek(queryset, ordering, values, direction=NEXT):
+    """
+    Применяет к queryset условие «после ключа values» в порядке ordering
+    (или «до ключа» для direction=PREVIOUS) и сортирует выборку так,
+    чтобы ближайшие к курсору строки шли первыми.
+    """
+    if direction == PREVIOUS:
+        ordering = tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in ordering
+        )
+    queryset = queryset.order_by(*ordering)
+    if values is None:
+        return queryset
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = '__lt' if field.startswith('-') else '__gt'
+        step = Q(**{name + lookup: values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return queryset.filter(condition)
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница ленты, построенная без подсчета строк в таблице."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
 
-from yatube.settings import POSTS_PER_PAGE
+    def __len__(self):
+        return len(self.object_list)
 
+    def __getitem__(self, index):
+        return self.object_list[index]
 
-def paginator_util(queryset, request):
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (keyset): вместо OFFSET выборка продолжается
+    от последней показанной строки, поэтому глубокие страницы
+    не медленнее первой, а COUNT(*) не нужен вовсе.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+
+    def key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def converters(self):
+        """Функции, приводящие значения ключа из курсора к типам."""
+        return None
+
+    def fetch(self, direction, values, limit):
+        """Возвращает до limit объектов, ближайших к курсору."""
+        return list(
+            seek(self.object_list, self.ordering, values, direction)[:limit]
+        )
+
+    def get_page(self, cursor):
+        direction, values = decode_cursor(
+            cursor, self.object_list.model, self.ordering, self.converters()
+        )
+        rows = self.fetch(direction or NEXT, values, self.per_page + 1)
+        if direction == PREVIOUS and not rows:
+            return self.get_page(None)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        if not rows:
+            return CursorPage([])
+        return CursorPage(
+            rows,
+            next_cursor=(
+                encode_cursor(NEXT, self.key(rows[-1])) if has_next else None
+            ),
+            previous_cursor=(
+                encode_cursor(PREVIOUS, self.key(rows[0]))
+                if has_previous else None
+            ),
+        )
+
+
+def paginator_util(queryset, request, keyset=False):
+    """
+    Возвращает страницу для шаблона includes/paginator.html.
+    С keyset=True лента листается по ключу (pub_date, id) токенами
+    из параметра ?cursor=, без COUNT(*) и OFFSET.
+    """
+    if keyset:
+        return CursorPaginator(queryset, POSTS_PER_PAGE).get_page(
+            request.GET.get('cursor')
+        )
     paginator = Paginator(queryset, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def comment_page(post, cursor=None):
+    """
+    Страница комментариев поста, новые первыми. Размер страницы поста
+    не зависит от числа комментариев: остальные листаются по курсору.
+    """
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        COMMENT_ORDERING,
+    ).get_page(cursor)
@@ -1,77 +1,172 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
+from django.urls import reverse
+
+from core.caching import add_cache_tags, cache_page_tagged
+from core.uploads import image_uploads, uploaded_files
 
+from . import thumbnails
+from .cache_tags import FEED, author_tag, group_tag, post_tag
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
-from .utils import paginator_util
+from .search import SearchPaginator
+from .timeline import follow_page
+from .utils import comment_page, paginator_util
 
 User = get_user_model()
 
 
-@cache_page(20)
-@vary_on_cookie
-def index(request):
+def follow_context(request, username, **kwargs):
+    """Состояние кнопки подписки для общей страницы профиля."""
+    return {
+        'following': request.user.is_authenticated and Follow.objects.filter(
+            author__username=username, user=request.user,
+        ).exists(),
+    }
+
+
+def comment_form_context(request, post_id):
+    """Форма комментария для общей страницы поста."""
+    return {'form': CommentForm()}
+
+
+def render_feed(request, template, context, fragment_url, fragment=False):
+    """
+    Страница ленты или, с fragment=True, только ее посты и ссылка
+    на продолжение: их дописывает в страницу static/js/load_more.js.
+    Фрагмент кешируется отдельно от страницы, по своему адресу.
+    """
+    context.update(fragment=fragment, fragment_url=fragment_url)
+    if fragment:
+        template = 'includes/post_list.html'
+    return render(request, template, context)
+
+
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, shared=True)
+def index(request, fragment=False):
     """Шаблон главной страницы."""
     template = 'posts/index.html'
-    page_obj = paginator_util(Post.objects.all(), request)
+    add_cache_tags(request, FEED)
+    page_obj = paginator_util(
+        Post.objects.select_related('author', 'group'), request, keyset=True
+    )
+    thumbnails.prefetch(page_obj, 'x750')
     context = {
         'page_obj': page_obj,
+        'show_author_link': True,
+        'show_group_link': True,
     }
-    return render(request, template, context)
+    return render_feed(
+        request, template, context, reverse('posts:index_fragment'), fragment
+    )
 
 
-def group_posts(request, slug):
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, shared=True)
+def group_posts(request, slug, fragment=False):
     """Шаблон страницы группы."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginator_util(group.posts.all(), request)
+    add_cache_tags(request, group_tag(group.pk))
+    page_obj = paginator_util(
+        group.posts.select_related('author', 'group'), request, keyset=True
+    )
+    thumbnails.prefetch(page_obj, 'x750')
     context = {
         'page_obj': page_obj,
         'group': group,
+        'show_author_link': True,
+        'show_group_link': False,
     }
-    return render(request, template, context)
+    return render_feed(
+        request,
+        template,
+        context,
+        reverse('posts:group_list_fragment', args=[slug]),
+        fragment,
+    )
 
 
-def profile(request, username):
+@cache_page_tagged(
+    settings.PAGE_CACHE_TIMEOUT, shared=True, personalize=follow_context
+)
+def profile(request, username, fragment=False):
     """Шаблон страницы пользователя."""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        author=author, user=request.user,
-    ).exists()
-    page_obj = paginator_util(author.posts.all(), request)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    add_cache_tags(request, author_tag(author.pk))
+    page_obj = paginator_util(
+        author.posts.select_related('author', 'group'), request, keyset=True
+    )
+    thumbnails.prefetch(page_obj, 'x750')
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'show_author_link': False,
+        'show_group_link': True,
     }
-    return render(request, template, context)
+    return render_feed(
+        request,
+        template,
+        context,
+        reverse('posts:profile_fragment', args=[username]),
+        fragment,
+    )
 
 
+@cache_page_tagged(
+    settings.PAGE_CACHE_TIMEOUT, shared=True, personalize=comment_form_context
+)
 def post_detail(request, post_id):
     """Шаблон страницы поста."""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
-    form = CommentForm(request.POST or None)
+    add_cache_tags(request, post_tag(post_id))
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    add_cache_tags(request, author_tag(post.author_id))
+    if post.group_id:
+        add_cache_tags(request, group_tag(post.group_id))
+    comments = comment_page(post, request.GET.get('cursor'))
+    thumbnails.prefetch([post], 'x600')
+    thumbnails.prefetch(comments, 'x750')
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, template, context)
+
+
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT)
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев поста."""
+    template = 'includes/comment_list.html'
+    add_cache_tags(request, post_tag(post_id))
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    comments = comment_page(post, request.GET.get('cursor'))
+    thumbnails.prefetch(comments, 'x750')
     context = {
         'post': post,
-        'form': form,
         'comments': comments,
     }
     return render(request, template, context)
 
 
 @login_required
+@image_uploads
+@transaction.atomic
 def post_create(request):
     """Шаблон страницы новой записи."""
     template = 'posts/create_post.html'
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None,
+        files=uploaded_files(request) or None,
     )
     if form.is_valid():
         post = form.save(commit=False)
@@ -85,15 +180,17 @@ def post_create(request):
 
 
 @login_required
+@image_uploads
+@transaction.atomic
 def post_edit(request, post_id):
     """Шаблон страницы редактирования записи."""
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post.pk)
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None,
+        files=uploaded_files(request) or None,
         instance=post
     )
     if form.is_valid():
@@ -104,12 +201,14 @@ def post_edit(request, post_id):
 
 
 @login_required
+@image_uploads
+@transaction.atomic
 def add_comment(request, post_id):
     """Шаблон нового комментария."""
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(
         request.POST or None,
-        files=request.FILES or None,
+        files=uploaded_files(request) or None,
     )
     if form.is_valid():
         comment = form.save(commit=False)
@@ -121,19 +220,27 @@ def add_comment(request, post_id):
 
 
 @login_required
-def follow_index(request):
+def follow_index(request, fragment=False):
     """Шаблон страницы подписок."""
     template = 'posts/follow.html'
-    page_obj = paginator_util(
-        Post.objects.filter(author__following__user=request.user), request
-    )
+    page_obj = follow_page(request.user, request)
+    thumbnails.prefetch(page_obj, 'x750')
     context = {
         'page_obj': page_obj,
+        'show_author_link': True,
+        'show_group_link': True,
     }
-    return render(request, template, context)
+    return render_feed(
+        request,
+        template,
+        context,
+        reverse('posts:follow_index_fragment'),
+        fragment,
+    )
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Шаблон профиля автора для подписки."""
     template = 'posts/profile.html'
@@ -148,6 +255,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Шаблон профиля автора для отписки."""
     Follow.objects.filter(
@@ -164,3 +272,19 @@ def groups(request):
         'page_obj': page_obj,
     }
     return render(request, template, context)
+
+
+def search(request):
+    """Шаблон страницы поиска по постам и комментариям."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = SearchPaginator(query, settings.POSTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    thumbnails.prefetch(page_obj, 'x750')
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
@@ -0,0 +1,64 @@
+// Подгрузка следующей страницы без перезагрузки: ссылка с атрибутом
+// data-load-more заменяется (вместе с блоком data-load-more-container)
+// фрагментом с этого адреса. Ссылки с data-infinite срабатывают сами,
+// когда до них докручивают ленту. Без JavaScript ссылка ведет
+// на обычную страницу с тем же курсором.
+(function () {
+  var observer = 'IntersectionObserver' in window
+    ? new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(entry.target);
+        }
+      });
+    }, {rootMargin: '600px'})
+    : null;
+
+  function watch(root) {
+    if (observer) {
+      root.querySelectorAll('[data-load-more][data-infinite]').forEach(
+        function (link) { observer.observe(link); }
+      );
+    }
+  }
+
+  function load(link) {
+    if (link.dataset.loading) {
+      return;
+    }
+    link.dataset.loading = 'true';
+    link.classList.add('disabled');
+    fetch(link.dataset.loadMore, {
+      headers: {'X-Requested-With': 'XMLHttpRequest'},
+      credentials: 'same-origin'
+    })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        var container = link.closest('[data-load-more-container]');
+        var fragment = document.createElement('template');
+        fragment.innerHTML = html;
+        watch(fragment.content);
+        container.replaceWith(fragment.content);
+      })
+      .catch(function () {
+        window.location = link.href;
+      });
+  }
+
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-load-more]');
+    if (link) {
+      event.preventDefault();
+      load(link);
+    }
+  });
+  document.addEventListener('DOMContentLoaded', function () {
+    watch(document);
+  });
+}());
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -48,11 +49,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,9 +63,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar — только для разработки и только если он установлен.
+if DEBUG and importlib.util.find_spec('debug_toolbar') is not None:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
@@ -144,18 +151,137 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+# Сколько последних комментариев показывать на странице поста;
+# остальные подгружаются по курсору.
+COMMENTS_PER_PAGE = 10
+
+# Авторы с бóльшим числом подписчиков не рассылают посты по лентам,
+# их посты подтягиваются в ленту подписок при чтении.
+TIMELINE_FAN_OUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL_LIMIT = 100
+# Больше скольких новых постов опрос отвечает просто «больше».
+NEW_POSTS_CAP = 100
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки хранятся по хешу содержимого, одинаковые — один раз.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# Миниатюры sorl называет сам, им обычное хранилище.
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# Картинки постов и комментариев пишутся на диск потоком и сразу
+# хешируются; слишком большие отбрасываются, не записываясь до конца
+# (core.uploads.image_uploads).
+UPLOAD_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Миниатюры, которые выводят шаблоны ({% responsive_image %}), строятся
+# заранее при сохранении картинки. Размеры должны совпадать с шаблонами.
+THUMBNAIL_GEOMETRIES = {
+    'posts.Post': ('x750', 'x600'),
+    'posts.Comment': ('x750',),
+}
+# Ширины вариантов для srcset и форматы, в которых они строятся
+# в дополнение к формату по умолчанию (JPEG).
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_FORMATS = ('WEBP',)
+# Фоновые потоки для миниатюр; 0 — строить сразу в запросе.
+THUMBNAIL_WORKERS = 2
+
+# Страницы сбрасываются по тегам при изменении данных,
+# поэтому TTL нужен только как страховка.
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Сколько еще отдавать истекшую страницу, пока ее пересчитывает
+# другой процесс или пока недоступна база.
+PAGE_CACHE_STALE_TTL = 60 * 10
+# Сколько ждать процесс, который пересчитывает запись.
+CACHE_LOCK_TIMEOUT = 10
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.tiered.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_SIZE': 16 * 1024 * 1024,
+            'L1_TIMEOUT': 5,
+            'SYNC_INTERVAL': 0.5,
+            'COMPRESS_MIN_SIZE': 1024,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты работают с кешами, логами и метриками во временном каталоге
+# (core.testing).
+TEST_RUNNER = 'core.testing.TestRunner'
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Профилирование запросов (core.profiling): заголовок Server-Timing,
+# доля запросов в лог и все запросы медленнее порога.
+PROFILING_SERVER_TIMING = True
+PROFILING_LOG_SAMPLE_RATE = 0.01
+PROFILING_SLOW_REQUEST_MS = 500
+# Журнал этих запросов, по строке JSON на запрос.
+PROFILING_LOG = os.path.join(BASE_DIR, 'profiling.log')
+# Куда сохранять профили запросов с подписанным заголовком X-Profile
+# и сколько секунд действует подпись.
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+# Метрики для Prometheus (core.metrics, /metrics/). Процессы сбрасывают
+# снимки в METRICS_DIR не чаще раза в METRICS_FLUSH_INTERVAL секунд;
+# каталог очищают при перезапуске сервера, как и обычные счетчики.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5
+# Токен для сборщика метрик не с INTERNAL_IPS; None — только INTERNAL_IPS.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Журнал медленных запросов к базе (core.slow_queries, manage.py
+# slow_queries): порог в миллисекундах и как часто писать повторы
+# одного и того же запроса.
+SLOW_QUERY_MS = 200
+SLOW_QUERY_LOG_INTERVAL = 60
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+        'profiling': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': PROFILING_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+        },
+        'core.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+        },
+    },
+}